@@ -3,14 +3,16 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_openai import ChatOpenAI
-from langchain_community.document_loaders import SeleniumURLLoader
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.documents import Document
 
 from dotenv import load_dotenv
 
+from web_fetch import fetch_all
+
 load_dotenv()
 
 model_name = "gpt-4o-mini"
@@ -25,17 +27,24 @@ documents = [
 ]
 
 
-def scrape_docs(urls: List[str]) -> List[Dict]:
-    """Scrape content from URLs using SeleniumURLLoader"""
+def scrape_docs(urls: List[str], **fetch_kwargs) -> List[Dict]:
+    """Scrape content from URLs: concurrent HTTP with a disk cache, browser only for JS pages"""
     try:
-        loader = SeleniumURLLoader(urls=urls)
-        raw_docs = loader.load()
+        results = fetch_all(urls, **fetch_kwargs)
+        raw_docs = [
+            Document(page_content=result.text, metadata={"source": result.url, "title": result.title})
+            for result in results
+            if result.error is None
+        ]
         print(f"\nSuccessfully loaded {len(raw_docs)} documents")
 
         # Print some information about the loaded documents
-        for doc in raw_docs:
-            print(f"\nSource: {doc.metadata.get('source', 'No source')}")
-            print(f"Content length: {len(doc.page_content)} characters")
+        for result in results:
+            print(f"\nSource: {result.url}")
+            if result.error:
+                print(f"Error: {result.error}")
+            else:
+                print(f"Content length: {len(result.text)} characters ({result.source})")
 
         return raw_docs
 
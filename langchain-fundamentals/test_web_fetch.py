@@ -0,0 +1,132 @@
+"""
+Tests for `fetch_all` against a local HTTP server and a fake browser (no network needed).
+
+    python -m pytest test_web_fetch.py
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from web_fetch import BrowserPool, fetch_all
+
+ARTICLE = "<html><head><title>Article</title></head><body><p>{}</p></body></html>".format(
+    "Server-rendered text. " * 20
+)
+SHELL = '<html><body><div id="root"></div><script src="/app.{}.js"></script></body></html>'
+RENDERED = "<html><head><title>App</title></head><body><p>{}</p></body></html>".format(
+    "Rendered by the app. " * 20
+)
+
+
+class Site:
+    """What the server returns, and a log of (path, status) per request"""
+
+    def __init__(self):
+        self.shell_version = 1
+        self.requests = []
+
+
+@pytest.fixture
+def site():
+    site = Site()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/article":
+                # Served with an ETag, honoured on revalidation
+                if self.headers.get("If-None-Match") == '"v1"':
+                    return self._reply(304)
+                return self._reply(200, ARTICLE, {"ETag": '"v1"'})
+            if self.path == "/app":
+                # A JS shell without ETag/Last-Modified
+                return self._reply(200, SHELL.format(site.shell_version))
+            self._reply(404)
+
+        def _reply(self, status, body="", headers=None):
+            site.requests.append((self.path, status))
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if status != 304:
+                data = body.encode()
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    site.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+class FakeBrowser:
+    """Selenium-like driver that 'renders' every page to RENDERED"""
+
+    loads = []
+
+    def get(self, url):
+        FakeBrowser.loads.append(url)
+
+    @property
+    def page_source(self):
+        return RENDERED
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def browsers():
+    FakeBrowser.loads = []
+    pool = BrowserPool(size=1, factory=FakeBrowser, settle_seconds=0)
+    yield pool
+    pool.close()
+
+
+def test_unchanged_page_is_revalidated_not_downloaded(site, browsers, tmp_path):
+    url = f"{site.url}/article"
+    first = fetch_all([url], browsers=browsers, cache_dir=str(tmp_path))[0]
+    second = fetch_all([url], browsers=browsers, cache_dir=str(tmp_path))[0]
+
+    assert (first.source, first.error, first.title) == ("network", None, "Article")
+    assert second.source == "cache"
+    assert second.html == first.html
+    assert site.requests == [("/article", 200), ("/article", 304)]
+    assert FakeBrowser.loads == []
+
+
+def test_js_shell_is_rendered_once_while_unchanged(site, browsers, tmp_path):
+    url = f"{site.url}/app"
+    first = fetch_all([url], browsers=browsers, cache_dir=str(tmp_path))[0]
+    second = fetch_all([url], browsers=browsers, cache_dir=str(tmp_path))[0]
+
+    assert (first.source, first.title) == ("browser", "App")
+    assert second.source == "cache"
+    assert second.html == RENDERED
+    assert FakeBrowser.loads == [url]
+
+    site.shell_version = 2  # new deploy: the shell changes, so render again
+    third = fetch_all([url], browsers=browsers, cache_dir=str(tmp_path))[0]
+    assert third.source == "browser"
+    assert FakeBrowser.loads == [url, url]
+
+
+def test_browser_failure_keeps_raw_html(site, tmp_path):
+    def broken_browser():
+        raise RuntimeError("no browser here")
+
+    pool = BrowserPool(size=1, factory=broken_browser, settle_seconds=0)
+    result = fetch_all([f"{site.url}/app"], browsers=pool, cache_dir=str(tmp_path))[0]
+
+    assert (result.source, result.error) == ("network", None)
+    assert result.html == SHELL.format(1)
@@ -0,0 +1,255 @@
+"""Concurrent, cached page fetching for the URL-based loaders.
+
+Pages are fetched with aiohttp under a concurrency limit. Only pages whose
+HTML carries too little text (client-side rendered sites) are loaded again
+through a small pool of reusable headless browsers. Every page is cached on
+disk, keyed by a hash of its URL, together with the ETag/Last-Modified
+validators of the HTTP response; later runs send conditional requests and
+reuse the cached copy on 304 Not Modified, so unchanged pages are never
+downloaded or rendered twice. Servers that send no validators still return
+the raw HTML, but a rendered page is only rendered again when a hash of that
+raw HTML has changed.
+
+Usage:
+    from web_fetch import fetch_all
+    results = fetch_all(["https://example.com/a", "https://example.com/b"])
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, List, Optional
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+DEFAULT_CACHE_DIR = ".web_cache"
+USER_AGENT = "Mozilla/5.0 (compatible; langchain-fundamentals/1.0)"
+
+# source: "network", "cache" (304, still fresh or an unchanged JS shell) or "browser";
+# error is None on success
+FetchResult = namedtuple("FetchResult", ["url", "html", "text", "title", "source", "error"])
+
+
+def extract_text(html: str):
+    """Return (visible text, title) of an HTML page"""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript", "template", "svg"]):
+        tag.decompose()
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    body = soup.body or soup
+    return body.get_text("\n", strip=True), title
+
+
+def needs_javascript(text: str, min_text_chars: int = 200) -> bool:
+    """Heuristic: a server-rendered page has real text; a JS shell has next to none"""
+    return len(text) < min_text_chars or "enable javascript" in text.lower()
+
+
+class PageCache:
+    """On-disk page store: <sha256(url)>.html plus a .json file with validators"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str, suffix: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + suffix)
+
+    def get(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._path(url, ".json")) as file:
+                entry = json.load(file)
+            with open(self._path(url, ".html"), encoding="utf-8") as file:
+                entry["html"] = file.read()
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def put(self, url: str, html: str, etag=None, last_modified=None, rendered=False, raw_hash=None):
+        # Body first, metadata last: a crash in between leaves no entry rather than a wrong one
+        self._write(self._path(url, ".html"), html)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "rendered": rendered,
+            "raw_hash": raw_hash,  # sha256 of the HTML as served, before rendering
+            "fetched_at": time.time(),
+        }
+        self._write(self._path(url, ".json"), json.dumps(meta))
+
+    def touch(self, url: str):
+        """Mark a cached page as just revalidated"""
+        entry = self.get(url)
+        if entry:
+            entry.pop("html")
+            entry["fetched_at"] = time.time()
+            self._write(self._path(url, ".json"), json.dumps(entry))
+
+    @staticmethod
+    def _write(path: str, content: str):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+
+
+def headless_chrome():
+    """Default browser factory: a headless Chrome driven by Selenium"""
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return webdriver.Chrome(options=options)
+
+
+class BrowserPool:
+    """Up to `size` browsers, started on first use and reused across pages.
+
+    `factory` returns an object with Selenium's `get(url)`, `page_source`
+    and `quit()`; pass a fake one to run without a real browser.
+    """
+
+    def __init__(self, size: int = 2, factory: Callable = headless_chrome, settle_seconds: float = 1.0):
+        self.size = size
+        self.factory = factory
+        self.settle_seconds = settle_seconds
+        self._idle = queue.Queue()
+        self._started = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._started) < self.size:
+                browser = self.factory()
+                self._started.append(browser)
+                return browser
+        return self._idle.get()
+
+    def render(self, url: str) -> str:
+        """Load `url` in an idle browser and return the rendered HTML (blocking)"""
+        browser = self._acquire()
+        try:
+            browser.get(url)
+            if self.settle_seconds:
+                time.sleep(self.settle_seconds)  # let client-side scripts fill the page
+            return browser.page_source
+        finally:
+            self._idle.put(browser)
+
+    def close(self):
+        with self._lock:
+            for browser in self._started:
+                try:
+                    browser.quit()
+                except Exception:
+                    pass
+            self._started = []
+            self._idle = queue.Queue()
+
+
+async def _fetch_one(session, url, cache, semaphore, browsers, max_age, min_text_chars):
+    entry = cache.get(url)
+    if entry and max_age is not None and time.time() - entry["fetched_at"] < max_age:
+        return entry["html"], "cache"
+
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    async with semaphore:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and entry:
+                cache.touch(url)
+                return entry["html"], "cache"
+            response.raise_for_status()
+            html = await response.text(errors="replace")
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+    # Without validators a JS shell is re-sent in full; if it is byte-for-byte
+    # what was rendered last time, reuse that render instead of a browser load
+    raw_hash = hashlib.sha256(html.encode()).hexdigest()
+    if entry and entry.get("rendered") and entry.get("raw_hash") == raw_hash:
+        cache.put(url, entry["html"], etag, last_modified, rendered=True, raw_hash=raw_hash)
+        return entry["html"], "cache"
+
+    source = "network"
+    if browsers and needs_javascript(extract_text(html)[0], min_text_chars):
+        try:
+            html = await asyncio.to_thread(browsers.render, url)
+            source = "browser"
+        except Exception as e:
+            # No usable browser (e.g. Selenium/Chrome missing): keep the raw HTML
+            print(f"⚠️  Browser rendering failed for {url}: {e}")
+
+    cache.put(url, html, etag, last_modified, rendered=source == "browser", raw_hash=raw_hash)
+    return html, source
+
+
+async def fetch_pages(
+    urls: List[str],
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    concurrency: int = 8,
+    timeout: float = 30.0,
+    max_age: Optional[float] = None,
+    browsers: Optional[BrowserPool] = None,
+    min_text_chars: int = 200,
+) -> List[FetchResult]:
+    """Fetch all URLs concurrently, revalidating cached copies.
+
+    `max_age` (seconds) skips the network entirely for recently fetched
+    pages; by default every cached page is revalidated with a conditional
+    request. Pages that look client-side rendered are re-loaded through
+    `browsers`, if given. Duplicate URLs are fetched once. Results are in
+    input order; failures are reported per URL in `error` instead of raising.
+    """
+    cache = PageCache(cache_dir)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=client_timeout, headers={"User-Agent": USER_AGENT}
+    ) as session:
+
+        async def fetch(url):
+            try:
+                html, source = await _fetch_one(
+                    session, url, cache, semaphore, browsers, max_age, min_text_chars
+                )
+            except Exception as e:
+                return FetchResult(url, None, "", "", None, f"{type(e).__name__}: {e}")
+            text, title = extract_text(html)
+            return FetchResult(url, html, text, title, source, None)
+
+        unique = list(dict.fromkeys(urls))
+        results = dict(zip(unique, await asyncio.gather(*(fetch(url) for url in unique))))
+        return [results[url] for url in urls]
+
+
+def fetch_all(urls: List[str], use_browser: bool = True, browser_pool_size: int = 2, **kwargs):
+    """Synchronous wrapper around fetch_pages that manages the browser pool"""
+    browsers = kwargs.pop("browsers", None)
+    owned = browsers is None and use_browser
+    if owned:
+        browsers = BrowserPool(browser_pool_size)
+    try:
+        return asyncio.run(fetch_pages(urls, browsers=browsers, **kwargs))
+    finally:
+        if owned:
+            browsers.close()
@@ -0,0 +1,271 @@
+"""Tokens-per-second benchmark for the create_simple_llm models.
+
+Sweeps prompt length, max_new_tokens, temperature (0 = greedy), batch size
+and torch thread count. Every case records prefill time, time to first
+token, decode tokens/sec and how far the process RSS rose above its level
+at the start of the case. Results are written as JSON
+and CSV; with --baseline they are compared case by case against an earlier
+run, and the script exits with status 1 if any metric regressed by more
+than --tolerance, so it can gate a transformers/torch upgrade.
+
+Usage:
+    python benchmark_generation.py --output benchmark_results/generation_baseline
+    python benchmark_generation.py --baseline benchmark_results/generation_baseline.json
+    python benchmark_generation.py --prompt-tokens 32 256 --batch-sizes 1 8 --threads 1 4
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+import psutil
+import torch
+import transformers
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from intro_transformer_enhanced import create_simple_llm
+
+# git_commit/export are shared with rag-fundamentals/benchmark_rag_pipeline.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rag-fundamentals"))
+from benchmark_export import export, git_commit  # noqa: E402
+
+CASE_KEYS = ["prompt_tokens", "max_new_tokens", "temperature", "batch_size", "threads"]
+# metric -> True if higher is better
+METRICS = {
+    "prefill_ms": False,
+    "first_token_ms": False,
+    "decode_tokens_per_s": True,
+    "peak_rss_increase_mb": False,
+}
+
+PASSAGE = (
+    "The transformer reads the prompt, predicts one token at a time, and feeds every new "
+    "token back in as input for the next prediction. "
+)
+
+
+class StepTimer(StoppingCriteria):
+    """Records when each new token is produced; never stops generation"""
+
+    def __init__(self):
+        self.times = []
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.times.append(time.perf_counter())
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+
+class PeakRss:
+    """Samples the process RSS on a background thread while the block runs.
+
+    `increase` is the peak relative to the RSS on entry: the process RSS
+    rarely shrinks, so the absolute peak of a case would mostly reflect
+    the cases that ran before it.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    @property
+    def increase(self):
+        return self.peak - self.start
+
+    def __enter__(self):
+        self.start = self.peak = self._process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+
+def make_prompt_ids(tokenizer, length):
+    """Token ids of exactly `length` tokens of English text"""
+    ids = tokenizer.encode(PASSAGE)
+    return (ids * (length // len(ids) + 1))[:length]
+
+
+def run_case(model, tokenizer, prompt_tokens, max_new_tokens, temperature, batch_size, repeat):
+    input_ids = torch.tensor([make_prompt_ids(tokenizer, prompt_tokens)] * batch_size)
+    attention_mask = torch.ones_like(input_ids)
+    sampling = {"do_sample": True, "temperature": temperature} if temperature > 0 else {"do_sample": False}
+
+    prefill, first_token, decode = [], [], []
+    with PeakRss() as rss:
+        with torch.inference_mode():
+            # Warmup so one-off allocations don't land in the first sample
+            model(input_ids=input_ids, attention_mask=attention_mask, use_cache=True)
+
+            for _ in range(repeat):
+                start = time.perf_counter()
+                model(input_ids=input_ids, attention_mask=attention_mask, use_cache=True)
+                prefill.append(time.perf_counter() - start)
+
+                timer = StepTimer()
+                start = time.perf_counter()
+                model.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    min_new_tokens=max_new_tokens,
+                    pad_token_id=tokenizer.eos_token_id,
+                    stopping_criteria=StoppingCriteriaList([timer]),
+                    **sampling,
+                )
+                first_token.append(timer.times[0] - start)
+                if len(timer.times) > 1:
+                    steps = len(timer.times) - 1
+                    decode.append(steps * batch_size / (timer.times[-1] - timer.times[0]))
+
+    return {
+        "prefill_ms": round(statistics.median(prefill) * 1000, 3),
+        "first_token_ms": round(statistics.median(first_token) * 1000, 3),
+        "decode_tokens_per_s": round(statistics.median(decode), 2) if decode else None,
+        "peak_rss_increase_mb": round(rss.increase / 2**20, 1),
+    }
+
+
+def case_key(row):
+    return tuple(row[key] for key in CASE_KEYS)
+
+
+def compare(rows, baseline_rows, tolerance):
+    """Return (comparison rows, regressions) of `rows` against a baseline run"""
+    baseline = {case_key(row): row for row in baseline_rows}
+    comparisons, regressions = [], []
+    for row in rows:
+        old = baseline.get(case_key(row))
+        if not old:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if row.get(metric) is None or not old.get(metric):
+                continue
+            change = row[metric] / old[metric] - 1
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            entry = {
+                **{key: row[key] for key in CASE_KEYS},
+                "metric": metric,
+                "baseline": old[metric],
+                "current": row[metric],
+                "change": round(change, 4),
+                "regressed": regressed,
+            }
+            comparisons.append(entry)
+            if regressed:
+                regressions.append(entry)
+    return comparisons, regressions
+
+
+def print_table(rows):
+    print(
+        f"\n{'prompt':>6} {'new':>5} {'temp':>5} {'batch':>5} {'thr':>4} "
+        f"{'prefill ms':>11} {'TTFT ms':>9} {'decode tok/s':>13} {'RSS +':>10}"
+    )
+    for row in rows:
+        decode = row["decode_tokens_per_s"]
+        print(
+            f"{row['prompt_tokens']:>6} {row['max_new_tokens']:>5} {row['temperature']:>5} "
+            f"{row['batch_size']:>5} {row['threads']:>4} {row['prefill_ms']:>11.1f} "
+            f"{row['first_token_ms']:>9.1f} {decode if decode is not None else float('nan'):>13.1f} "
+            f"{row['peak_rss_increase_mb']:>7.0f} MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens-per-second benchmark for create_simple_llm")
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--prompt-tokens", type=int, nargs="+", default=[16, 128, 512])
+    parser.add_argument("--max-new-tokens", type=int, nargs="+", default=[32, 128])
+    parser.add_argument("--temperatures", type=float, nargs="+", default=[0.0, 0.7],
+                        help="0 decodes greedily")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[torch.get_num_threads()])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results/generation")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    generator = create_simple_llm(args.model)
+    model, tokenizer = generator.model.eval(), generator.tokenizer
+    context = model.config.n_positions
+
+    rows = []
+    cases = itertools.product(
+        args.threads, args.prompt_tokens, args.max_new_tokens, args.temperatures, args.batch_sizes
+    )
+    for threads, prompt_tokens, max_new_tokens, temperature, batch_size in cases:
+        if prompt_tokens + max_new_tokens > context:
+            print(f"Skipping {prompt_tokens}+{max_new_tokens} tokens: exceeds the {context}-token context")
+            continue
+        torch.set_num_threads(threads)
+        print(
+            f"Benchmarking prompt={prompt_tokens} new={max_new_tokens} "
+            f"temperature={temperature} batch={batch_size} threads={threads}..."
+        )
+        metrics = run_case(
+            model, tokenizer, prompt_tokens, max_new_tokens, temperature, batch_size, args.repeat
+        )
+        rows.append({
+            "prompt_tokens": prompt_tokens,
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "batch_size": batch_size,
+            "threads": threads,
+            **metrics,
+        })
+
+    print_table(rows)
+    meta = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model": args.model,
+        "repeat": args.repeat,
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+    comparisons, regressions = None, []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        comparisons, regressions = compare(rows, baseline["results"], args.tolerance)
+        print(
+            f"\nCompared {len(comparisons)} metrics with {args.baseline} "
+            f"(torch {baseline['meta'].get('torch')}, transformers {baseline['meta'].get('transformers')})"
+        )
+        for entry in regressions:
+            case = ", ".join(f"{key}={entry[key]}" for key in CASE_KEYS)
+            print(
+                f"⚠️  {entry['metric']} regressed {entry['change']:+.1%} "
+                f"({entry['baseline']} -> {entry['current']}) for {case}"
+            )
+        if not regressions:
+            print(f"✅ No regressions beyond {args.tolerance:.0%}")
+
+    export(rows, meta, args.output, comparison=comparisons)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
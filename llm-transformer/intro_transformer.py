@@ -1,8 +1,12 @@
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import torch
 from transformers.pipelines import pipeline
-from typing import List
 
 
-def create_simple_llm(model_name: str = "distilgpt2"):
+def create_simple_llm(model_name: str = "distilgpt2", dtype: str = "float32", device: str = "cpu"):
     """
     Initializes a simple text generation pipeline using a lightweight GPT-2 model.
 
@@ -11,6 +15,10 @@ def create_simple_llm(model_name: str = "distilgpt2"):
     model_name : str
         Pretrained model identifier from Hugging Face model hub.
         Default is 'distilgpt2', a small and efficient GPT-2 variant (~82M parameters).
+    dtype : str
+        Name of the torch dtype to load the weights in ('float32', 'bfloat16', ...).
+    device : str
+        Device to run on ('cpu', 'cuda', 'cuda:1', ...).
 
     Returns
     -------
@@ -25,15 +33,122 @@ def create_simple_llm(model_name: str = "distilgpt2"):
     return pipeline(
         task="text-generation",
         model=model_name,
+        torch_dtype=getattr(torch, dtype),
+        device=device,
         pad_token_id=50256  # End-of-text token ID used as a padding substitute
     )
 
 
+class LoadedModel:
+    """
+    A generator shared through the model registry, with its load and usage timings.
+
+    Attributes
+    ----------
+    generator : TextGenerationPipeline
+        The loaded, warmed-up pipeline.
+    load_seconds : float
+        Time spent reading weights and tokenizer from disk.
+    warmup_seconds : float
+        Time of the dummy generation run right after loading.
+    generate_calls : int
+        Number of `generate_text` calls served by this model.
+    generate_seconds : float
+        Total time spent inside those calls.
+    """
+
+    def __init__(self, generator, load_seconds: float, warmup_seconds: float):
+        self.generator = generator
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        self.generate_calls = 0
+        self.generate_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_generate(self, seconds: float):
+        with self._lock:
+            self.generate_calls += 1
+            self.generate_seconds += seconds
+
+
+# Process-wide cache: each (model_name, dtype, device) is loaded once and shared
+_MODEL_REGISTRY: Dict[Tuple[str, str, str], LoadedModel] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_llm(model_name: str = "distilgpt2", dtype: str = "float32", device: str = "cpu") -> LoadedModel:
+    """
+    Returns the shared generator for a model, loading and warming it on first use.
+
+    Parameters
+    ----------
+    model_name : str
+        Pretrained model identifier from Hugging Face model hub.
+    dtype : str
+        Name of the torch dtype to load the weights in.
+    device : str
+        Device to run on.
+
+    Returns
+    -------
+    LoadedModel
+        The registry entry; use `.generator` to generate.
+
+    Notes
+    -----
+    - Loading happens under a lock, so concurrent first callers load the model once.
+    - The warmup generation absorbs one-off costs (lazy allocations, kernel
+      selection) so the first real request only pays inference time.
+    """
+    key = (model_name, dtype, device)
+    with _REGISTRY_LOCK:
+        if key not in _MODEL_REGISTRY:
+            start = time.perf_counter()
+            generator = create_simple_llm(model_name, dtype, device)
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            generator("Hello", max_new_tokens=8, do_sample=False)
+            warmup_seconds = time.perf_counter() - start
+
+            _MODEL_REGISTRY[key] = LoadedModel(generator, load_seconds, warmup_seconds)
+        return _MODEL_REGISTRY[key]
+
+
+def model_timings() -> List[dict]:
+    """
+    Summarizes load time versus generate time for every model in the registry.
+
+    Returns
+    -------
+    List[dict]
+        One entry per loaded model with its key, load/warmup seconds and
+        the number and total duration of generate calls.
+    """
+    with _REGISTRY_LOCK:
+        entries = list(_MODEL_REGISTRY.items())
+    return [
+        {
+            "model_name": model_name,
+            "dtype": dtype,
+            "device": device,
+            "load_seconds": entry.load_seconds,
+            "warmup_seconds": entry.warmup_seconds,
+            "generate_calls": entry.generate_calls,
+            "generate_seconds": entry.generate_seconds,
+        }
+        for (model_name, dtype, device), entry in entries
+    ]
+
+
 def generate_text(
     prompt: str,
     max_new_tokens: int = 256,
     num_return_sequences: int = 1,
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    model_name: str = "distilgpt2",
+    dtype: str = "float32",
+    device: str = "cpu"
 ) -> List[str]:
     """
     Generates text from a given prompt using the LLM.
@@ -48,21 +163,25 @@ def generate_text(
         Number of unique sequences to return.
     temperature : float
         Controls randomness in sampling (0 = deterministic, >1 = more creative).
+    model_name, dtype, device
+        Which registry model to use; it is loaded only on the first call.
 
     Returns
     -------
     List[str]
         A list of generated text continuations.
     """
-    generator = create_simple_llm()
+    model = get_llm(model_name, dtype, device)
 
-    results = generator(
+    start = time.perf_counter()
+    results = model.generator(
         prompt,
         max_new_tokens=max_new_tokens,
         num_return_sequences=num_return_sequences,
         do_sample=True,
         temperature=temperature
     )
+    model.record_generate(time.perf_counter() - start)
 
     return [result["generated_text"] for result in results]
 
@@ -73,3 +192,13 @@ if __name__ == "__main__":
 
     for idx, text in enumerate(outputs, 1):
         print(f"\n--- Generated Text {idx} ---\n{text}\n")
+
+    # The second call reuses the loaded model and only pays for inference
+    generate_text("The first astronaut", max_new_tokens=64)
+
+    for stats in model_timings():
+        print(
+            f"⏱️ {stats['model_name']} ({stats['dtype']}, {stats['device']}): "
+            f"load {stats['load_seconds']:.2f}s, warmup {stats['warmup_seconds']:.2f}s, "
+            f"{stats['generate_calls']} generations in {stats['generate_seconds']:.2f}s"
+        )
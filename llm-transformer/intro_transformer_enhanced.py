@@ -1,9 +1,18 @@
+import threading
+import time
+from typing import Iterator, List, Optional
+
+import torch
 from transformers.pipelines import pipeline
-from transformers import AutoTokenizer
-from typing import Optional
+from transformers import AutoTokenizer, DynamicCache, TextIteratorStreamer
 
 
-def create_simple_llm(model_name: str = "distilgpt2"):
+def create_simple_llm(
+    model_name: str = "distilgpt2",
+    quantization: str = "fp32",
+    backend: str = "torch",
+    num_threads: Optional[int] = None
+):
     """
     Initializes a simple causal language model using Hugging Face Transformers.
 
@@ -11,12 +20,41 @@ def create_simple_llm(model_name: str = "distilgpt2"):
     ----------
     model_name : str
         Name of the pretrained model to use (default: 'distilgpt2').
+    quantization : str
+        'fp32' (default), 'int8' for dynamic int8 linear layers, or 'bf16'
+        for bfloat16 weights. Converted models are cached on disk; see
+        `quantized_llm`.
+    backend : str
+        'torch' (default) or 'onnx' to run an exported graph on ONNX Runtime;
+        see `onnx_backend`.
+    num_threads : int, optional
+        ONNX Runtime intra-op thread count (ignored by the torch backend).
 
     Returns
     -------
     generator : transformers.pipelines.text_generation.TextGenerationPipeline
-        A ready-to-use text generation pipeline.
+        A ready-to-use text generation pipeline. With backend='onnx', an
+        `OnnxTextGenerator` that accepts the same call arguments.
     """
+    if backend == "onnx":
+        if quantization != "fp32":
+            raise ValueError("The ONNX backend only supports quantization='fp32'")
+        from onnx_backend import create_onnx_llm
+
+        return create_onnx_llm(model_name, num_threads)
+    if backend != "torch":
+        raise ValueError(f"Unknown backend {backend!r}, expected 'torch' or 'onnx'")
+
+    if quantization != "fp32":
+        from quantized_llm import load_quantized_model
+
+        return pipeline(
+            task="text-generation",
+            model=load_quantized_model(model_name, quantization),
+            tokenizer=AutoTokenizer.from_pretrained(model_name),
+            pad_token_id=50256
+        )
+
     return pipeline(
         task="text-generation",
         model=model_name,
@@ -59,6 +97,493 @@ def generate_text(
     return result[0]["generated_text"]
 
 
+class _TimedStreamer(TextIteratorStreamer):
+    """TextIteratorStreamer that also records when each generated token arrives."""
+
+    def __init__(self, tokenizer):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.token_times: List[float] = []
+
+    def put(self, value):
+        if not self.next_tokens_are_prompt:
+            self.token_times.append(time.perf_counter())
+        super().put(value)
+
+
+class TokenStream:
+    """
+    Iterator over text pieces as they are generated, with latency statistics.
+
+    Iterate it to receive decoded text; once exhausted, `stats()` reports
+    time-to-first-token and inter-token latency.
+    """
+
+    def __init__(self, streamer: _TimedStreamer, start: float):
+        self._streamer = streamer
+        self._start = start
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def __iter__(self) -> Iterator[str]:
+        for text in self._streamer:
+            if text:
+                yield text
+        self._thread.join()
+        if self._error:
+            raise self._error
+
+    @property
+    def tokens(self) -> int:
+        return len(self._streamer.token_times)
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        times = self._streamer.token_times
+        return times[0] - self._start if times else None
+
+    @property
+    def inter_token_latency(self) -> Optional[float]:
+        times = self._streamer.token_times
+        if len(times) < 2:
+            return None
+        return (times[-1] - times[0]) / (len(times) - 1)
+
+    def stats(self) -> dict:
+        """Tokens, time to first token and mean inter-token latency (seconds)."""
+        return {
+            "tokens": self.tokens,
+            "time_to_first_token": self.time_to_first_token,
+            "inter_token_latency": self.inter_token_latency,
+        }
+
+
+def stream_text(
+    generator,
+    prompt: str,
+    max_new_tokens: int = 256,
+    temperature: float = 0.7
+) -> TokenStream:
+    """
+    Generates a continuation on a worker thread, yielding text as tokens are produced.
+
+    Parameters
+    ----------
+    generator : TextGenerationPipeline
+        The pipeline returned by `create_simple_llm`.
+    prompt : str
+        Initial input text to seed the generation.
+    max_new_tokens : int
+        Number of new tokens to generate (after the prompt).
+    temperature : float
+        Sampling temperature to control randomness.
+
+    Returns
+    -------
+    TokenStream
+        Iterable of generated text pieces (the prompt is not repeated).
+    """
+    model = generator.model
+    base_model = getattr(model, model.base_model_prefix)
+    lm_head = model.get_output_embeddings()
+    tokenizer = generator.tokenizer
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    streamer = _TimedStreamer(tokenizer)
+    stream = TokenStream(streamer, time.perf_counter())
+
+    def run():
+        try:
+            with torch.inference_mode():
+                model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=True,
+                    temperature=temperature,
+                    pad_token_id=tokenizer.eos_token_id,
+                    streamer=streamer
+                )
+        except Exception as e:
+            stream._error = e
+            streamer.end()
+
+    stream._thread = threading.Thread(target=run, daemon=True)
+    stream._thread.start()
+    return stream
+
+
+def generate_batch(
+    generator,
+    prompts: List[str],
+    batch_size: int = 8,
+    max_new_tokens: int = 64,
+    temperature: float = 0.7,
+    return_stats: bool = False
+):
+    """
+    Generates continuations for many prompts, running them through the model in batches.
+
+    Parameters
+    ----------
+    generator : TextGenerationPipeline
+        The pipeline returned by `create_simple_llm`.
+    prompts : List[str]
+        Input texts; outputs are returned in the same order.
+    batch_size : int
+        Number of prompts decoded together.
+    max_new_tokens : int
+        Number of new tokens to generate per prompt.
+    temperature : float
+        Sampling temperature; 0 decodes greedily.
+    return_stats : bool
+        Also return throughput statistics.
+
+    Returns
+    -------
+    List[str] or (List[str], dict)
+        Prompt plus generated text for each prompt, like `generate_text`, and
+        with `return_stats` a dict of prompts, batches, new_tokens, seconds
+        and tokens_per_second.
+
+    Notes
+    -----
+    - Prompts are sorted by token length so each batch pads as little as possible.
+    - Padding goes on the left with the EOS token, so every row's last prompt
+      token sits in the final column where generation continues from.
+    """
+    model = generator.model
+    base_model = getattr(model, model.base_model_prefix)
+    lm_head = model.get_output_embeddings()
+    tokenizer = generator.tokenizer
+    pad_token_id = tokenizer.eos_token_id
+
+    encoded = [tokenizer.encode(prompt) or [pad_token_id] for prompt in prompts]
+    order = sorted(range(len(prompts)), key=lambda i: len(encoded[i]))
+    outputs: List[Optional[str]] = [None] * len(prompts)
+    new_tokens = 0
+    batches = 0
+
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for offset in range(0, len(order), batch_size):
+            indices = order[offset:offset + batch_size]
+            longest = len(encoded[indices[-1]])
+
+            input_ids = torch.full((len(indices), longest), pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros_like(input_ids)
+            for row, i in enumerate(indices):
+                input_ids[row, longest - len(encoded[i]):] = torch.tensor(encoded[i])
+                attention_mask[row, longest - len(encoded[i]):] = 1
+
+            sampling = {"do_sample": False}
+            if temperature > 0:
+                sampling = {"do_sample": True, "temperature": temperature}
+            generated = model.generate(
+                input_ids=input_ids.to(model.device),
+                attention_mask=attention_mask.to(model.device),
+                max_new_tokens=max_new_tokens,
+                pad_token_id=pad_token_id,
+                **sampling
+            )[:, longest:].tolist()
+
+            for row, i in enumerate(indices):
+                tokens = generated[row]
+                if pad_token_id in tokens:
+                    tokens = tokens[:tokens.index(pad_token_id)]
+                new_tokens += len(tokens)
+                outputs[i] = prompts[i] + tokenizer.decode(tokens)
+            batches += 1
+    seconds = time.perf_counter() - start
+
+    if not return_stats:
+        return outputs
+    return outputs, {
+        "prompts": len(prompts),
+        "batches": batches,
+        "new_tokens": new_tokens,
+        "seconds": seconds,
+        "tokens_per_second": new_tokens / seconds if seconds else 0.0,
+    }
+
+
+def score_texts(generator, texts: List[str], batch_size: int = 16,
+                logit_block: int = 128) -> List[dict]:
+    """
+    Scores texts by their log-likelihood under the model.
+
+    Parameters
+    ----------
+    generator : TextGenerationPipeline
+        The pipeline returned by `create_simple_llm`.
+    texts : List[str]
+        Texts to score; results are returned in the same order.
+    batch_size : int
+        Number of texts run through the model together.
+    logit_block : int
+        Positions projected onto the vocabulary at a time. Full logits for a
+        batch of long texts take gigabytes (16 x 1024 x 50257 floats is
+        ~3.3 GB), so only `batch_size x logit_block` of them exist at once.
+
+    Returns
+    -------
+    List[dict]
+        Per text: `mean_logprob` (average natural-log probability per token),
+        `perplexity` (exp of the negative mean) and `tokens` (number scored).
+        A text with no scored tokens (an empty string) gets None for
+        `mean_logprob` and `perplexity`, so it cannot rank as the best text.
+
+    Notes
+    -----
+    - The EOS token is prepended as a beginning-of-text marker so the first
+      real token is scored too; texts longer than the context are truncated.
+    - Texts are length-sorted and right-padded; padding is excluded with the
+      attention mask and from the averages.
+    """
+    model = generator.model
+    base_model = getattr(model, model.base_model_prefix)
+    lm_head = model.get_output_embeddings()
+    tokenizer = generator.tokenizer
+    bos = tokenizer.eos_token_id
+    max_length = model.config.n_positions
+
+    encoded = [([bos] + tokenizer.encode(text))[:max_length] for text in texts]
+    order = sorted(range(len(texts)), key=lambda i: len(encoded[i]))
+    results: List[Optional[dict]] = [None] * len(texts)
+
+    with torch.inference_mode():
+        for offset in range(0, len(order), batch_size):
+            indices = order[offset:offset + batch_size]
+            longest = len(encoded[indices[-1]])
+
+            input_ids = torch.full((len(indices), longest), bos, dtype=torch.long)
+            attention_mask = torch.zeros_like(input_ids)
+            for row, i in enumerate(indices):
+                input_ids[row, :len(encoded[i])] = torch.tensor(encoded[i])
+                attention_mask[row, :len(encoded[i])] = 1
+            input_ids = input_ids.to(model.device)
+            attention_mask = attention_mask.to(model.device)
+
+            hidden = base_model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state[:, :-1]
+            targets = input_ids[:, 1:]
+            token_logprobs = torch.empty(targets.shape, device=model.device)
+            for start in range(0, targets.shape[1], logit_block):
+                end = start + logit_block
+                logits = lm_head(hidden[:, start:end]).float()
+                # log p(target) = logit(target) - logsumexp(logits), without a full log_softmax copy
+                token_logprobs[:, start:end] = (
+                    logits.gather(-1, targets[:, start:end].unsqueeze(-1)).squeeze(-1)
+                    - logits.logsumexp(-1)
+                )
+            mask = attention_mask[:, 1:].float()
+
+            counts = mask.sum(-1)
+            means = (token_logprobs * mask).sum(-1) / counts.clamp(min=1)
+            for row, i in enumerate(indices):
+                count = int(counts[row])
+                mean = float(means[row]) if count else None
+                results[i] = {
+                    "mean_logprob": mean,
+                    "perplexity": float(torch.exp(torch.tensor(-mean))) if count else None,
+                    "tokens": count,
+                }
+
+    return results
+
+
+class GenerationSession:
+    """
+    Multi-turn generation that keeps the KV cache of everything said so far.
+
+    Each turn only runs the new tokens through the model; the shared prefix
+    is read from `past_key_values` instead of being recomputed.
+
+    Parameters
+    ----------
+    generator : TextGenerationPipeline
+        The pipeline returned by `create_simple_llm`.
+    max_context_tokens : int, optional
+        Token budget for the cached context (default: the model's context size).
+
+    Notes
+    -----
+    - GPT-2 uses absolute position embeddings, so a cache cannot simply be
+      trimmed at the front. When a turn would exceed the budget, the oldest
+      tokens are dropped (down to half the budget) and the remaining tail is
+      prefilled once from scratch.
+    """
+
+    def __init__(self, generator, max_context_tokens: Optional[int] = None):
+        self.model = generator.model
+        self.tokenizer = generator.tokenizer
+        limit = self.model.config.n_positions
+        self.max_context_tokens = min(max_context_tokens or limit, limit)
+        self.reset()
+
+    def reset(self):
+        """Forget the accumulated context."""
+        self.token_ids: List[int] = []
+        self.cached_tokens = 0  # token_ids[:cached_tokens] are in past_key_values
+        self.past_key_values = None
+
+    def _forward(self, input_ids: List[int]) -> torch.Tensor:
+        """Extend the cache with `input_ids` and return the logits for the last one."""
+        outputs = self.model(
+            input_ids=torch.tensor([input_ids], device=self.model.device),
+            # An explicit DynamicCache, so the cache can be cropped
+            past_key_values=self.past_key_values if self.past_key_values is not None else DynamicCache(),
+            use_cache=True
+        )
+        self.past_key_values = outputs.past_key_values
+        self.cached_tokens += len(input_ids)
+        return outputs.logits[0, -1].float()
+
+    def generate(self, text: str, max_new_tokens: int = 64, temperature: float = 0.7):
+        """
+        Appends `text` to the context and generates a continuation.
+
+        Parameters
+        ----------
+        text : str
+            New input for this turn.
+        max_new_tokens : int
+            Number of new tokens to generate.
+        temperature : float
+            Sampling temperature; 0 decodes greedily.
+
+        Returns
+        -------
+        (str, dict)
+            Generated text, and stats: prefill_tokens, reused_tokens,
+            prefill_seconds, evicted_tokens and context_tokens.
+        """
+        max_new_tokens = min(max_new_tokens, self.max_context_tokens - 1)
+        new_ids = self.tokenizer.encode(text)
+        self.token_ids.extend(new_ids)
+        if not self.token_ids:
+            self.token_ids.append(self.tokenizer.eos_token_id)
+
+        evicted = 0
+        if len(self.token_ids) + max_new_tokens > self.max_context_tokens:
+            # Drop to half the budget rather than just under it, so the
+            # following turns extend the new cache instead of re-prefilling
+            keep = min(
+                max(len(new_ids), self.max_context_tokens // 2),
+                self.max_context_tokens - max_new_tokens
+            )
+            evicted = len(self.token_ids) - keep
+            self.token_ids = self.token_ids[-keep:]
+            self.cached_tokens = 0
+            self.past_key_values = None
+
+        pending = self.token_ids[self.cached_tokens:]
+        if not pending:
+            # Nothing new since the cached context (an empty turn after one
+            # that ended at EOS): re-feed the last token to get its logits
+            self.cached_tokens -= 1
+            if self.cached_tokens:
+                self.past_key_values.crop(self.cached_tokens)
+            else:
+                self.past_key_values = None
+            pending = self.token_ids[self.cached_tokens:]
+        reused = self.cached_tokens
+        generated: List[int] = []
+
+        with torch.inference_mode():
+            start = time.perf_counter()
+            logits = self._forward(pending)
+            prefill_seconds = time.perf_counter() - start
+
+            for _ in range(max_new_tokens):
+                if temperature > 0:
+                    probs = torch.softmax(logits / temperature, dim=-1)
+                    token = int(torch.multinomial(probs, 1))
+                else:
+                    token = int(logits.argmax())
+                if token == self.tokenizer.eos_token_id:
+                    break
+                generated.append(token)
+                self.token_ids.append(token)
+                if len(generated) < max_new_tokens:
+                    logits = self._forward([token])
+
+        return self.tokenizer.decode(generated), {
+            "prefill_tokens": len(pending),
+            "reused_tokens": reused,
+            "prefill_seconds": prefill_seconds,
+            "evicted_tokens": evicted,
+            "context_tokens": len(self.token_ids),
+        }
+
+
+def benchmark_prefix_cache(generator, turns: int = 8, max_new_tokens: int = 16):
+    """
+    Compares prefill time with and without KV-cache reuse as a conversation grows.
+
+    Each turn appends a fixed passage; the session prefills only the new
+    tokens, while the baseline runs the whole context through the model.
+    """
+    passage = (
+        " The transformer reads the prompt, predicts one token at a time, and feeds"
+        " every new token back in as input for the next prediction."
+    )
+    session = GenerationSession(generator)
+    model = generator.model
+    with torch.inference_mode():
+        model(input_ids=torch.tensor([generator.tokenizer.encode(passage)], device=model.device))
+
+    print(f"\n{'turn':>4} {'context':>8} {'full prefill':>13} {'cached prefill':>15} {'saved':>7}")
+    for turn in range(1, turns + 1):
+        _, stats = session.generate(passage, max_new_tokens=max_new_tokens, temperature=0)
+        context = session.token_ids[:stats["reused_tokens"] + stats["prefill_tokens"]]
+
+        with torch.inference_mode():
+            start = time.perf_counter()
+            model(input_ids=torch.tensor([context], device=model.device))
+            full_seconds = time.perf_counter() - start
+
+        saved = 1 - stats["prefill_seconds"] / full_seconds
+        print(
+            f"{turn:>4} {len(context):>8} {full_seconds * 1000:>10.1f} ms "
+            f"{stats['prefill_seconds'] * 1000:>12.1f} ms {saved:>6.0%}"
+            + ("  (evicted, re-prefilled)" if stats["evicted_tokens"] else "")
+        )
+
+
+def session_demo():
+    """
+    Multi-turn prompting that reuses the KV cache of earlier turns.
+    """
+    generator = create_simple_llm()
+    session = GenerationSession(generator)
+
+    print("\n🧵 Session Mode: each prompt continues the text so far")
+    print("Type your prompt below ('reset' to clear context, 'bench' to benchmark, 'quit' to exit)\n")
+
+    while True:
+        prompt = input("✍️ Prompt: ").strip()
+        if prompt.lower() == "quit":
+            print("👋 Exiting session mode.")
+            break
+        if prompt.lower() == "reset":
+            session.reset()
+            print("🧹 Context cleared.\n")
+            continue
+        if prompt.lower() == "bench":
+            benchmark_prefix_cache(generator)
+            print()
+            continue
+        if not prompt:
+            print("⚠️ Empty prompt. Please try again.")
+            continue
+
+        output, stats = session.generate(" " + prompt if session.token_ids else prompt)
+        print("\n💬 Generated Response:\n", output)
+        print(
+            f"\n⏱️ prefilled {stats['prefill_tokens']} new tokens in "
+            f"{stats['prefill_seconds'] * 1000:.0f} ms, reused {stats['reused_tokens']} cached"
+            + (f", evicted {stats['evicted_tokens']}" if stats["evicted_tokens"] else "")
+            + f" ({stats['context_tokens']} in context)\n"
+        )
+
+
 def run_llm_demo():
     """
     Runs an educational demo with preset prompts and generated outputs.
@@ -75,9 +600,14 @@ def run_llm_demo():
         "Python programming is",
     ]
 
-    for i, prompt in enumerate(prompts, 1):
+    outputs, stats = generate_batch(generator, prompts, max_new_tokens=256, return_stats=True)
+    print(
+        f"⚡ Generated {stats['new_tokens']} tokens for {stats['prompts']} prompts in "
+        f"{stats['seconds']:.1f}s ({stats['tokens_per_second']:.1f} tokens/sec)"
+    )
+
+    for i, (prompt, output) in enumerate(zip(prompts, outputs), 1):
         print(f"\n🔹 Prompt {i}: {prompt}")
-        output = generate_text(generator, prompt)
         print("🔸 Generated:", output)
         input("\n⏩ Press Enter to continue...")
 
@@ -100,8 +630,21 @@ def interactive_demo():
             print("⚠️ Empty prompt. Please try again.")
             continue
 
-        output = generate_text(generator, prompt)
-        print("\n💬 Generated Response:\n", output, "\n")
+        print("\n💬 Generated Response:\n", prompt, end="", flush=True)
+        stream = stream_text(generator, prompt)
+        for text in stream:
+            print(text, end="", flush=True)
+
+        stats = stream.stats()
+        if stats["tokens"]:
+            latency = stats["inter_token_latency"] or 0.0
+            print(
+                f"\n\n⏱️ {stats['tokens']} tokens, first after "
+                f"{stats['time_to_first_token'] * 1000:.0f} ms, then "
+                f"{latency * 1000:.0f} ms/token\n"
+            )
+        else:
+            print("\n")
 
 
 def explain_process():
@@ -132,8 +675,10 @@ def main():
     print("1. Run Basic Demonstration")
     print("2. Interactive Prompting")
     print("3. Explain How It Works")
+    print("4. Session Mode (KV cache reuse)")
+    print("5. Speculative Decoding (distilgpt2 drafts for gpt2-medium)")
 
-    choice = input("Enter your choice (1-3): ").strip()
+    choice = input("Enter your choice (1-5): ").strip()
 
     if choice == "1":
         run_llm_demo()
@@ -141,8 +686,14 @@ def main():
         interactive_demo()
     elif choice == "3":
         explain_process()
+    elif choice == "4":
+        session_demo()
+    elif choice == "5":
+        from speculative import speculative_demo
+
+        speculative_demo()
     else:
-        print("❌ Invalid choice. Please enter 1, 2, or 3.")
+        print("❌ Invalid choice. Please enter 1, 2, 3, 4, or 5.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,367 @@
+"""
+ONNX Runtime backend for the demo text generator.
+
+The model is exported once to ONNX with explicit KV-cache inputs
+(`past.<layer>.key/value`) and outputs (`present.<layer>.key/value`), so each
+decoding step only runs the new token through the graph. The exported graph
+is cached under `onnx_models/`.
+
+`OnnxTextGenerator` is called like the Transformers pipeline, so it can be
+passed straight to `generate_text`:
+
+    generator = create_simple_llm(backend="onnx")
+    print(generate_text(generator, "Once upon a time"))
+
+Running this file compares it with the PyTorch path:
+
+    python onnx_backend.py --model distilgpt2 --batch-sizes 1 4 16 --threads 4
+"""
+
+import argparse
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+import onnxruntime as ort
+import psutil
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models")
+
+
+class _CausalLMWithPast(torch.nn.Module):
+    """Exposes the KV cache as flat tensors, which is what an ONNX graph can take."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.n_layer = model.config.n_layer
+
+    def forward(self, input_ids, attention_mask, position_ids, cache_position, *past):
+        cache = DynamicCache.from_legacy_cache(
+            tuple((past[2 * i], past[2 * i + 1]) for i in range(self.n_layer))
+        )
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            cache_position=cache_position,
+            past_key_values=cache,
+            use_cache=True
+        )
+        present = outputs.past_key_values.to_legacy_cache()
+        return (outputs.logits,) + tuple(tensor for layer in present for tensor in layer)
+
+
+def _past_names(n_layer: int, prefix: str) -> List[str]:
+    return [f"{prefix}.{i}.{kind}" for i in range(n_layer) for kind in ("key", "value")]
+
+
+def export_onnx(model_name: str, path: str, opset: int = 17) -> str:
+    """
+    Exports a causal LM to ONNX with KV-cache inputs and outputs.
+
+    Parameters
+    ----------
+    model_name : str
+        Pretrained model identifier or local path.
+    path : str
+        Destination .onnx file; written atomically.
+    opset : int
+        ONNX opset version.
+
+    Returns
+    -------
+    str
+        The path written.
+    """
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    # export() restores the wrapper's training mode afterwards, so it must be eval too
+    wrapper = _CausalLMWithPast(model).eval()
+    config = model.config
+    head_dim = config.n_embd // config.n_head
+
+    # Trace with a non-empty cache and a multi-token input so neither is baked in
+    batch, past_length, length = 2, 3, 4
+    past = [torch.zeros(batch, config.n_head, past_length, head_dim) for _ in range(2 * config.n_layer)]
+    inputs = (
+        torch.ones(batch, length, dtype=torch.long),
+        torch.ones(batch, past_length + length, dtype=torch.long),
+        torch.arange(past_length, past_length + length).expand(batch, length),
+        torch.arange(past_length, past_length + length),
+        *past,
+    )
+
+    past_names = _past_names(config.n_layer, "past")
+    present_names = _past_names(config.n_layer, "present")
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "total_sequence"},
+        "position_ids": {0: "batch", 1: "sequence"},
+        "cache_position": {0: "sequence"},
+        "logits": {0: "batch", 1: "sequence"},
+    }
+    dynamic_axes.update({name: {0: "batch", 2: "past_sequence"} for name in past_names})
+    dynamic_axes.update({name: {0: "batch", 2: "total_sequence"} for name in present_names})
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            inputs,
+            tmp_path,
+            input_names=["input_ids", "attention_mask", "position_ids", "cache_position"] + past_names,
+            output_names=["logits"] + present_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+class OnnxTextGenerator:
+    """
+    Text generator running an exported model on ONNX Runtime.
+
+    Parameters
+    ----------
+    model_name : str
+        Pretrained model identifier or local path; exported on first use.
+    num_threads : int, optional
+        Intra-op threads for ONNX Runtime (default: physical core count).
+    cache_dir : str
+        Where exported graphs are kept.
+    """
+
+    def __init__(self, model_name: str = "distilgpt2", num_threads: Optional[int] = None,
+                 cache_dir: str = DEFAULT_CACHE_DIR):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.eos_token_id = self.tokenizer.eos_token_id
+
+        path = os.path.join(cache_dir, model_name.strip("/").replace("/", "--"), "model.onnx")
+        if not os.path.exists(path):
+            print(f"📦 Exporting {model_name} to ONNX (one-time)...")
+            export_onnx(model_name, path)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or psutil.cpu_count(logical=False) or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.num_threads = options.intra_op_num_threads
+
+        self.past_names = [i.name for i in self.session.get_inputs() if i.name.startswith("past.")]
+        n_head, _, head_dim = self.session.get_inputs()[4].shape[1:]
+        self.past_shape = (n_head, head_dim)
+        self.rng = np.random.default_rng()
+
+    def generate(self, input_ids: np.ndarray, attention_mask: np.ndarray, max_new_tokens: int = 64,
+                 do_sample: bool = False, temperature: float = 1.0, top_k: Optional[int] = 50,
+                 ignore_eos: bool = False) -> np.ndarray:
+        """
+        Decodes a left-padded batch, reusing the KV cache between steps.
+
+        Parameters
+        ----------
+        input_ids, attention_mask : np.ndarray
+            int64 arrays of shape (batch, prompt_length), padded on the left.
+        max_new_tokens : int
+            Number of tokens to generate per row.
+        do_sample : bool
+            Sample with `temperature`; greedy otherwise.
+        top_k : int, optional
+            Sample only among the `top_k` most likely tokens, like the
+            transformers default of 50; 0 or None samples the full vocabulary.
+        ignore_eos : bool
+            Never emit EOS, so every row gets exactly `max_new_tokens` (for
+            benchmarking). Otherwise a row stops at EOS and is EOS-filled.
+
+        Returns
+        -------
+        np.ndarray
+            Generated token ids, shape (batch, <= max_new_tokens).
+        """
+        batch = input_ids.shape[0]
+        n_head, head_dim = self.past_shape
+        attention_mask = attention_mask.astype(np.int64)
+        position_ids = np.clip(attention_mask.cumsum(-1) - 1, 0, None)
+        feeds = {
+            "input_ids": input_ids.astype(np.int64),
+            "attention_mask": attention_mask,
+            "position_ids": position_ids,
+            "cache_position": np.arange(input_ids.shape[1], dtype=np.int64),
+        }
+        empty = np.zeros((batch, n_head, 0, head_dim), dtype=np.float32)
+        feeds.update({name: empty for name in self.past_names})
+
+        generated = []
+        finished = np.zeros(batch, dtype=bool)
+        for _ in range(max_new_tokens):
+            outputs = self.session.run(None, feeds)
+            logits = outputs[0][:, -1, :]
+            if ignore_eos:
+                logits[:, self.eos_token_id] = -np.inf
+
+            if do_sample and temperature > 0:
+                scaled = logits / temperature
+                if top_k and top_k < scaled.shape[-1]:
+                    kth = np.partition(scaled, -top_k, axis=-1)[:, -top_k, None]
+                    scaled = np.where(scaled < kth, -np.inf, scaled)
+                probs = np.exp(scaled - scaled.max(axis=-1, keepdims=True))
+                probs /= probs.sum(axis=-1, keepdims=True)
+                draws = self.rng.random((batch, 1))
+                next_tokens = (probs.cumsum(axis=-1) < draws).sum(axis=-1)
+                next_tokens = np.minimum(next_tokens, logits.shape[-1] - 1)
+            else:
+                next_tokens = logits.argmax(axis=-1)
+
+            next_tokens = np.where(finished, self.eos_token_id, next_tokens).astype(np.int64)
+            generated.append(next_tokens)
+            finished |= next_tokens == self.eos_token_id
+            if finished.all():
+                break
+
+            total = feeds["attention_mask"].shape[1] + 1
+            feeds = {
+                "input_ids": next_tokens[:, None],
+                "attention_mask": np.concatenate(
+                    [feeds["attention_mask"], np.ones((batch, 1), dtype=np.int64)], axis=1
+                ),
+                "position_ids": feeds["position_ids"][:, -1:] + 1,
+                "cache_position": np.array([total - 1], dtype=np.int64),
+            }
+            feeds.update(zip(self.past_names, outputs[1:]))
+
+        return np.stack(generated, axis=1) if generated else np.zeros((batch, 0), dtype=np.int64)
+
+    def _decode(self, tokens) -> str:
+        tokens = list(tokens)
+        if self.eos_token_id in tokens:
+            tokens = tokens[:tokens.index(self.eos_token_id)]
+        return self.tokenizer.decode(tokens)
+
+    def __call__(self, prompt: str, max_new_tokens: int = 256, num_return_sequences: int = 1,
+                 do_sample: bool = True, temperature: float = 1.0, **kwargs) -> List[dict]:
+        """Pipeline-compatible call: returns [{"generated_text": prompt + continuation}, ...]."""
+        ids = self.tokenizer.encode(prompt) or [self.eos_token_id]
+        input_ids = np.array([ids] * num_return_sequences, dtype=np.int64)
+        tokens = self.generate(input_ids, np.ones_like(input_ids), max_new_tokens,
+                               do_sample=do_sample, temperature=temperature,
+                               top_k=kwargs.get("top_k", 50))
+        return [{"generated_text": prompt + self._decode(row)} for row in tokens]
+
+
+def create_onnx_llm(model_name: str = "distilgpt2", num_threads: Optional[int] = None) -> OnnxTextGenerator:
+    """
+    Builds the ONNX Runtime generator, exporting the model on first use.
+
+    Parameters
+    ----------
+    model_name : str
+        Pretrained model identifier or local path.
+    num_threads : int, optional
+        Intra-op threads for ONNX Runtime.
+
+    Returns
+    -------
+    OnnxTextGenerator
+        Callable with the same arguments `generate_text` passes to a pipeline.
+    """
+    return OnnxTextGenerator(model_name, num_threads)
+
+
+def _left_pad(tokenizer, prompts: List[str]):
+    encoded = [tokenizer.encode(prompt) or [tokenizer.eos_token_id] for prompt in prompts]
+    longest = max(len(ids) for ids in encoded)
+    input_ids = np.full((len(prompts), longest), tokenizer.eos_token_id, dtype=np.int64)
+    attention_mask = np.zeros_like(input_ids)
+    for row, ids in enumerate(encoded):
+        input_ids[row, longest - len(ids):] = ids
+        attention_mask[row, longest - len(ids):] = 1
+    return input_ids, attention_mask
+
+
+def benchmark(model_name: str = "distilgpt2", batch_sizes=(1, 4, 16), max_new_tokens: int = 32,
+              num_threads: Optional[int] = None, repeat: int = 3) -> List[dict]:
+    """
+    Times greedy generation on PyTorch and ONNX Runtime at each batch size.
+
+    Returns
+    -------
+    List[dict]
+        One row per (backend, batch size) with median latency and tokens/sec.
+    """
+    onnx_generator = create_onnx_llm(model_name, num_threads)
+    torch.set_num_threads(onnx_generator.num_threads)
+    model = AutoModelForCausalLM.from_pretrained(model_name).eval()
+    tokenizer = onnx_generator.tokenizer
+
+    base_prompts = ["The quick brown fox", "Once upon a time in a land far away", "Python programming is"]
+    rows = []
+    for batch_size in batch_sizes:
+        prompts = (base_prompts * batch_size)[:batch_size]
+        input_ids, attention_mask = _left_pad(tokenizer, prompts)
+
+        def run_torch():
+            with torch.inference_mode():
+                output = model.generate(
+                    input_ids=torch.from_numpy(input_ids),
+                    attention_mask=torch.from_numpy(attention_mask),
+                    max_new_tokens=max_new_tokens,
+                    min_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.eos_token_id
+                )
+            return output[:, input_ids.shape[1]:].numpy()
+
+        def run_onnx():
+            return onnx_generator.generate(input_ids, attention_mask, max_new_tokens, ignore_eos=True)
+
+        outputs = {}
+        for backend, run in (("torch", run_torch), ("onnx", run_onnx)):
+            run()  # warmup
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                outputs[backend] = run()
+                times.append(time.perf_counter() - start)
+            seconds = float(np.median(times))
+            rows.append({
+                "backend": backend,
+                "batch_size": batch_size,
+                "latency_ms": seconds * 1000,
+                "tokens_per_second": batch_size * max_new_tokens / seconds,
+            })
+        rows[-1]["matches_torch"] = bool(np.array_equal(outputs["torch"], outputs["onnx"]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ONNX Runtime and PyTorch generation")
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = benchmark(args.model, args.batch_sizes, args.max_new_tokens, args.threads, args.repeat)
+
+    print(f"\n{'backend':<8} {'batch':>5} {'latency':>11} {'tokens/s':>10}  greedy output")
+    for row in rows:
+        match = ""
+        if "matches_torch" in row:
+            match = "same as torch" if row["matches_torch"] else "differs from torch"
+        print(
+            f"{row['backend']:<8} {row['batch_size']:>5} {row['latency_ms']:>8.1f} ms "
+            f"{row['tokens_per_second']:>10.1f}  {match}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""
+OpenAI-compatible HTTP server for the local `create_simple_llm` model.
+
+Serves `/v1/completions` and `/v1/chat/completions` (plain JSON or SSE
+streaming) plus `/v1/models`, so anything built on the OpenAI client --
+`LLMModel`, the chatbots, the RAG apps -- can be pointed at a local,
+GPU-free model, e.g.:
+
+    python openai_server.py --model distilgpt2 --port 8000
+    OLLAMA_BASE_URL=http://localhost:8000/v1 python ../rag-fundamentals/simple_rag.py
+
+Concurrent requests are not generated one at a time: the scheduler waits a
+few milliseconds after the first request to collect more, then runs them as
+one left-padded batch, decoding all sequences together step by step with a
+shared KV cache. Tokens are pushed to each request as they are produced.
+
+The app is a plain ASGI callable served by uvicorn, so it needs no web
+framework beyond what is already in requirements.txt.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import torch
+import uvicorn
+
+from intro_transformer_enhanced import create_simple_llm
+
+
+class GenerationRequest:
+    """
+    One prompt waiting for (or being served by) the batch scheduler.
+
+    Events are delivered on `events` as ("delta", text) while generating and
+    a final ("done", finish_reason) or ("error", message).
+    """
+
+    def __init__(self, prompt_ids: List[int], max_new_tokens: int, temperature: float,
+                 stop: List[str]):
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.stop = stop
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.completion_tokens = 0
+
+
+class BatchScheduler:
+    """
+    Collects concurrent requests into padded batches and decodes them together.
+
+    Parameters
+    ----------
+    generator : TextGenerationPipeline
+        Pipeline from `create_simple_llm`; its model and tokenizer are used directly.
+    max_batch_size : int
+        Upper bound on sequences decoded together.
+    batch_window_ms : float
+        How long to wait after the first request for others to join its batch.
+    top_k : int, optional
+        Sample only among the `top_k` most likely tokens, matching the
+        transformers default that `generate_text` runs with; 0 or None
+        samples the full vocabulary.
+    """
+
+    def __init__(self, generator, max_batch_size: int = 8, batch_window_ms: float = 10.0,
+                 top_k: Optional[int] = 50):
+        self.model = generator.model.eval()
+        self.tokenizer = generator.tokenizer
+        self.eos_token_id = self.tokenizer.eos_token_id
+        self.max_positions = self.model.config.n_positions
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000
+        self.top_k = top_k
+        # One thread: batches run back to back while the event loop keeps
+        # accepting (and queueing) new requests
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+        self.pending: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.pending = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._schedule())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, prompt: str, max_new_tokens: int, temperature: float,
+                     stop: List[str]) -> GenerationRequest:
+        """Queue a prompt, truncating it from the left to fit the context window."""
+        max_new_tokens = min(max_new_tokens, self.max_positions - 1)
+        budget = self.max_positions - max_new_tokens
+        prompt_ids = self.tokenizer.encode(prompt)[-budget:] or [self.eos_token_id]
+        request = GenerationRequest(prompt_ids, max_new_tokens, temperature, stop)
+        await self.pending.put(request)
+        return request
+
+    def _fits(self, batch: List[GenerationRequest], request: GenerationRequest) -> bool:
+        """Whether `request` can join `batch` without the padded batch outgrowing the context."""
+        longest = max(len(r.prompt_ids) for r in batch + [request])
+        steps = max(r.max_new_tokens for r in batch + [request])
+        return longest + steps <= self.max_positions
+
+    async def _schedule(self):
+        loop = asyncio.get_running_loop()
+        # Requests that did not fit the batch being formed; they start the next one
+        deferred: deque = deque()
+        while True:
+            batch = [deferred.popleft() if deferred else await self.pending.get()]
+            for request in list(deferred):
+                if len(batch) < self.max_batch_size and self._fits(batch, request):
+                    deferred.remove(request)
+                    batch.append(request)
+
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self.pending.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if self._fits(batch, request):
+                    batch.append(request)
+                else:
+                    deferred.append(request)
+
+            try:
+                await loop.run_in_executor(self.executor, self._generate_batch, batch, loop)
+            except Exception as e:
+                for request in batch:
+                    request.events.put_nowait(("error", str(e)))
+
+    def _sample(self, logits: torch.Tensor, temperatures: torch.Tensor) -> torch.Tensor:
+        """Greedy for rows with temperature 0, top-k temperature sampling otherwise."""
+        greedy = logits.argmax(dim=-1)
+        scaled = logits / temperatures.clamp(min=1e-5).unsqueeze(-1)
+        if self.top_k and self.top_k < scaled.shape[-1]:
+            kth = scaled.topk(self.top_k, dim=-1).values[:, -1:]
+            scaled = scaled.masked_fill(scaled < kth, float("-inf"))
+        sampled = torch.multinomial(torch.softmax(scaled, dim=-1), 1).squeeze(-1)
+        return torch.where(temperatures > 0, sampled, greedy)
+
+    def _generate_batch(self, batch: List[GenerationRequest], loop):
+        """Decode a batch step by step, emitting text to each request as it grows."""
+
+        def emit(request, *event):
+            loop.call_soon_threadsafe(request.events.put_nowait, event)
+
+        size = len(batch)
+        longest = max(len(request.prompt_ids) for request in batch)
+        # Left padding keeps every sequence's last token in the last column
+        input_ids = torch.full((size, longest), self.eos_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((size, longest), dtype=torch.long)
+        for row, request in enumerate(batch):
+            input_ids[row, longest - len(request.prompt_ids):] = torch.tensor(request.prompt_ids)
+            attention_mask[row, longest - len(request.prompt_ids):] = 1
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+        temperatures = torch.tensor([request.temperature for request in batch])
+
+        generated: List[List[int]] = [[] for _ in batch]
+        sent = [""] * size
+        finished = [False] * size
+        past_key_values = None
+        steps = max(request.max_new_tokens for request in batch)
+
+        with torch.inference_mode():
+            for _ in range(steps):
+                outputs = self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    position_ids=position_ids,
+                    past_key_values=past_key_values,
+                    use_cache=True,
+                )
+                past_key_values = outputs.past_key_values
+                next_tokens = self._sample(outputs.logits[:, -1, :].float(), temperatures)
+
+                for row, request in enumerate(batch):
+                    if finished[row]:
+                        continue
+                    token = int(next_tokens[row])
+                    if token == self.eos_token_id:
+                        finished[row] = True
+                        emit(request, "done", "stop")
+                        continue
+
+                    generated[row].append(token)
+                    request.completion_tokens += 1
+                    text = self.tokenizer.decode(generated[row])
+                    reason = "length" if len(generated[row]) >= request.max_new_tokens else None
+
+                    stop_at = min(
+                        (text.find(s) for s in request.stop if s and s in text), default=-1
+                    )
+                    if stop_at >= 0:
+                        text, reason = text[:stop_at], "stop"
+
+                    # Hold back an incomplete UTF-8 character or a possible stop prefix
+                    ready = text
+                    if reason is None:
+                        if text.endswith("�"):
+                            ready = text[:-1]
+                        holdback = max((len(s) - 1 for s in request.stop), default=0)
+                        if holdback:
+                            ready = ready[: max(len(sent[row]), len(ready) - holdback)]
+                    if len(ready) > len(sent[row]):
+                        emit(request, "delta", ready[len(sent[row]):])
+                        sent[row] = ready
+
+                    if reason:
+                        finished[row] = True
+                        emit(request, "done", reason)
+
+                if all(finished):
+                    break
+
+                # Finished rows keep decoding masked-out padding at a frozen
+                # position; their output is ignored
+                done = torch.tensor(finished)
+                input_ids = torch.where(done, torch.tensor(self.eos_token_id), next_tokens).unsqueeze(-1)
+                attention_mask = torch.cat(
+                    [attention_mask, (~done).long().unsqueeze(-1)], dim=-1
+                )
+                position_ids = position_ids[:, -1:] + (~done).long().unsqueeze(-1)
+
+
+def format_chat(messages: List[Dict[str, str]]) -> str:
+    """Flatten chat messages into a plain-text prompt for a base (non-chat) model."""
+    lines = [f"{m.get('role', 'user').capitalize()}: {m.get('content', '')}" for m in messages]
+    return "\n".join(lines) + "\nAssistant:"
+
+
+class OpenAICompatibleApp:
+    """
+    ASGI application exposing the scheduler through the OpenAI REST API.
+    """
+
+    def __init__(self, scheduler: BatchScheduler, model_name: str,
+                 default_max_tokens: int = 128):
+        self.scheduler = scheduler
+        self.model_name = model_name
+        self.default_max_tokens = default_max_tokens
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        path, method = scope["path"].rstrip("/"), scope["method"]
+        try:
+            if method == "GET" and path in ("/health", "/v1/health"):
+                await self._json(send, {"status": "ok"})
+            elif method == "GET" and path == "/v1/models":
+                await self._json(send, {
+                    "object": "list",
+                    "data": [{"id": self.model_name, "object": "model", "owned_by": "local"}],
+                })
+            elif method == "POST" and path == "/v1/completions":
+                await self._completion(await self._read_json(receive), send, chat=False)
+            elif method == "POST" and path == "/v1/chat/completions":
+                await self._completion(await self._read_json(receive), send, chat=True)
+            else:
+                await self._error(send, 404, f"Unknown endpoint {method} {path}")
+        except ValueError as e:
+            await self._error(send, 400, str(e))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.scheduler.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.scheduler.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_json(receive) -> dict:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+        if not isinstance(request, dict):
+            raise ValueError("The JSON body must be an object")
+        return request
+
+    @staticmethod
+    async def _json(send, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _error(self, send, status: int, message: str):
+        await self._json(send, {"error": {"message": message, "type": "invalid_request_error"}},
+                         status)
+
+    def _parse(self, request: dict, chat: bool):
+        """Validate a request body and return (prompt, max_tokens, temperature, stop)."""
+        if chat:
+            messages = request.get("messages")
+            if not isinstance(messages, list) or not messages:
+                raise ValueError("'messages' must be a non-empty list")
+            prompt = format_chat(messages)
+        else:
+            prompt = request.get("prompt")
+            if isinstance(prompt, list) and len(prompt) == 1:
+                prompt = prompt[0]
+            if not isinstance(prompt, str):
+                raise ValueError("'prompt' must be a string")
+
+        # null means "use the default", as in the OpenAI API
+        max_tokens = request.get("max_completion_tokens") or request.get("max_tokens")
+        try:
+            max_tokens = int(max_tokens if max_tokens is not None else self.default_max_tokens)
+        except (TypeError, ValueError):
+            raise ValueError("'max_tokens' must be an integer")
+        if not 1 <= max_tokens < self.scheduler.max_positions:
+            raise ValueError(f"'max_tokens' must be between 1 and {self.scheduler.max_positions - 1}")
+
+        temperature = request.get("temperature")
+        try:
+            temperature = float(temperature if temperature is not None else 0.7)
+        except (TypeError, ValueError):
+            raise ValueError("'temperature' must be a number")
+        if temperature < 0:
+            raise ValueError("'temperature' must be >= 0")
+
+        stop = request.get("stop") or []
+        stop = [stop] if isinstance(stop, str) else stop
+        if not isinstance(stop, list) or not all(isinstance(s, str) for s in stop):
+            raise ValueError("'stop' must be a string or a list of strings")
+        stop = list(stop)
+        if chat:
+            # A base model happily writes the user's next turn too
+            stop.append("\nUser:")
+        return prompt, max_tokens, temperature, stop
+
+    async def _completion(self, request: dict, send, chat: bool):
+        prompt, max_tokens, temperature, stop = self._parse(request, chat)
+        job = await self.scheduler.submit(prompt, max_tokens, temperature, stop)
+
+        completion_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        def usage():
+            prompt_tokens = len(job.prompt_ids)
+            return {"prompt_tokens": prompt_tokens, "completion_tokens": job.completion_tokens,
+                    "total_tokens": prompt_tokens + job.completion_tokens}
+
+        def chunk(text: Optional[str], finish_reason: Optional[str], first: bool = False):
+            if chat:
+                delta = {"role": "assistant"} if first else {}
+                if text:
+                    delta["content"] = text
+                choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                kind = "chat.completion.chunk"
+            else:
+                choice = {"index": 0, "text": text or "", "logprobs": None,
+                          "finish_reason": finish_reason}
+                kind = "text_completion"
+            return {"id": completion_id, "object": kind, "created": created,
+                    "model": self.model_name, "choices": [choice]}
+
+        if request.get("stream"):
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream"),
+                            (b"cache-control", b"no-cache")],
+            })
+
+            async def event(payload):
+                data = payload if isinstance(payload, str) else json.dumps(payload)
+                await send({"type": "http.response.body",
+                            "body": f"data: {data}\n\n".encode(), "more_body": True})
+
+            if chat:
+                await event(chunk(None, None, first=True))
+            while True:
+                kind, value = await job.events.get()
+                if kind == "delta":
+                    await event(chunk(value, None))
+                else:
+                    if kind == "error":
+                        await event({"error": {"message": value, "type": "server_error"}})
+                    else:
+                        final = chunk(None, value)
+                        final["usage"] = usage()
+                        await event(final)
+                    break
+            await event("[DONE]")
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        text, finish_reason = "", None
+        while True:
+            kind, value = await job.events.get()
+            if kind == "delta":
+                text += value
+            elif kind == "error":
+                await self._json(send, {"error": {"message": value, "type": "server_error"}}, 500)
+                return
+            else:
+                finish_reason = value
+                break
+
+        if chat:
+            choice = {"index": 0, "message": {"role": "assistant", "content": text},
+                      "finish_reason": finish_reason}
+            kind = "chat.completion"
+        else:
+            choice = {"index": 0, "text": text, "logprobs": None, "finish_reason": finish_reason}
+            kind = "text_completion"
+        await self._json(send, {"id": completion_id, "object": kind, "created": created,
+                                "model": self.model_name, "choices": [choice], "usage": usage()})
+
+
+def create_app(model_name: str = "distilgpt2", max_batch_size: int = 8,
+               batch_window_ms: float = 10.0) -> OpenAICompatibleApp:
+    """
+    Loads the model and wraps it in an OpenAI-compatible ASGI app.
+
+    Parameters
+    ----------
+    model_name : str
+        Model to serve, passed to `create_simple_llm`.
+    max_batch_size : int
+        Maximum number of requests decoded together.
+    batch_window_ms : float
+        How long the scheduler waits to fill a batch after the first request.
+
+    Returns
+    -------
+    OpenAICompatibleApp
+        ASGI application, e.g. for `uvicorn.run(app)`.
+    """
+    scheduler = BatchScheduler(create_simple_llm(model_name), max_batch_size, batch_window_ms)
+    return OpenAICompatibleApp(scheduler, model_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible server for a local causal LM")
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--batch-window-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    app = create_app(args.model, args.max_batch_size, args.batch_window_ms)
+    print(f"🚀 Serving {args.model} at http://{args.host}:{args.port}/v1")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
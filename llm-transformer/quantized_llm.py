@@ -0,0 +1,283 @@
+"""
+Reduced-precision CPU variants of the demo models.
+
+`load_quantized_model` returns the model with the linear layers of its
+transformer blocks converted to dynamic int8 (weights stored as int8,
+activations quantized on the fly) or with all weights cast to bfloat16, and
+caches the result on disk so the conversion runs once per model. `create_simple_llm(..., quantization="int8")`
+in `intro_transformer_enhanced` builds its pipeline from it.
+
+Running this file benchmarks every mode against the fp32 baseline:
+
+    python quantized_llm.py --model distilgpt2 --max-new-tokens 64
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import queue
+import time
+from typing import List, Optional
+
+import psutil
+import torch
+import transformers
+from torch import nn
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+from transformers.pytorch_utils import Conv1D
+
+QUANTIZATION_MODES = ("fp32", "int8", "bf16")
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quantized_models")
+
+EVAL_TEXTS = [
+    "The quick brown fox jumps over the lazy dog while the farmer watches from the porch.",
+    "Once upon a time, in a small village by the sea, there lived an old fisherman and his wife.",
+    "Python programming is popular because its syntax is readable and its libraries are extensive.",
+    "The first human landing on the Moon took place in July 1969 during the Apollo 11 mission.",
+]
+
+
+def conv1d_to_linear(model: nn.Module) -> nn.Module:
+    """
+    Replaces GPT-2 `Conv1D` layers with equivalent `nn.Linear` layers, in place.
+
+    GPT-2 implements its projections as `Conv1D` (a linear layer with a
+    transposed weight), which dynamic quantization does not recognise.
+    """
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, child_name, linear)
+    return model
+
+
+def bf16_supported() -> bool:
+    """Whether the CPU has native bfloat16 matmuls (AVX512-BF16 or AMX); elsewhere they are emulated."""
+    checks = [getattr(torch.cpu, name, None) for name in ("_is_avx512_bf16_supported", "_is_amx_tile_supported")]
+    return any(check() for check in checks if check)
+
+
+def _resolve_mode(mode: str) -> str:
+    """Validate `mode`, falling back from bf16 to fp32 on CPUs without bf16 support."""
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode {mode!r}, expected one of {QUANTIZATION_MODES}")
+    if mode == "bf16" and not bf16_supported():
+        print("⚠️  This CPU has no native bfloat16 support (slower than fp32); using fp32 instead")
+        return "fp32"
+    return mode
+
+
+def _checkpoint_fingerprint(model_name: str) -> str:
+    """
+    Short hash identifying the checkpoint: its config and resolved hub revision,
+    plus the size and mtime of every file for a local directory.
+    """
+    config = AutoConfig.from_pretrained(model_name)
+    parts = [config.to_json_string(), str(getattr(config, "_commit_hash", None))]
+    if os.path.isdir(model_name):
+        for name in sorted(os.listdir(model_name)):
+            stat = os.stat(os.path.join(model_name, name))
+            parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:12]
+
+
+def quantize_model(model: nn.Module, mode: str) -> nn.Module:
+    """
+    Converts a loaded fp32 model to the given precision.
+
+    Parameters
+    ----------
+    model : PreTrainedModel
+        Model in fp32, on CPU.
+    mode : str
+        One of QUANTIZATION_MODES.
+
+    Returns
+    -------
+    PreTrainedModel
+        The converted model in eval mode (fp32 for "bf16" on CPUs without
+        bfloat16 support).
+    """
+    mode = _resolve_mode(mode)
+    model.eval()
+    if mode == "bf16":
+        return model.to(torch.bfloat16)
+    if mode == "int8":
+        conv1d_to_linear(model)
+        # Only the transformer blocks: lm_head is tied to the fp32 token
+        # embedding, and an int8 copy of it would untie them, adding a
+        # second vocab-sized matrix and hurting perplexity
+        base = getattr(model, model.base_model_prefix)
+        torch.ao.quantization.quantize_dynamic(base, {nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def load_quantized_model(model_name: str = "distilgpt2", mode: str = "int8",
+                         cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
+    """
+    Loads a model in the given precision, reusing a converted copy from disk if present.
+
+    Parameters
+    ----------
+    model_name : str
+        Pretrained model identifier or local path.
+    mode : str
+        One of QUANTIZATION_MODES.
+    cache_dir : str, optional
+        Where converted models are stored; None disables the disk cache.
+
+    Returns
+    -------
+    PreTrainedModel
+        The model in eval mode.
+
+    Notes
+    -----
+    The cache holds pickled modules, so its key includes the torch and
+    transformers versions and a fingerprint of the checkpoint; an entry that
+    fails to load is rebuilt.
+    """
+    mode = _resolve_mode(mode)
+    path = None
+    if cache_dir and mode != "fp32":
+        safe_name = model_name.strip("/").replace("/", "--")
+        key = (f"{safe_name}-{mode}-torch{torch.__version__}-transformers{transformers.__version__}"
+               f"-{_checkpoint_fingerprint(model_name)}")
+        path = os.path.join(cache_dir, f"{key}.pt")
+        if os.path.exists(path):
+            try:
+                # The cache holds a pickled module written by this script
+                return torch.load(path, weights_only=False).eval()
+            except Exception as e:
+                print(f"⚠️  Could not load cached {path} ({e}); converting again")
+
+    model = quantize_model(AutoModelForCausalLM.from_pretrained(model_name), mode)
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, path)
+    return model
+
+
+def perplexity(model, tokenizer, texts: List[str]) -> float:
+    """Token-weighted perplexity of `texts` under `model`."""
+    total_loss, total_tokens = 0.0, 0
+    with torch.inference_mode():
+        for text in texts:
+            input_ids = tokenizer(text, return_tensors="pt").input_ids
+            loss = model(input_ids=input_ids, labels=input_ids).loss.float()
+            count = input_ids.shape[1] - 1
+            total_loss += loss.item() * count
+            total_tokens += count
+    return float(torch.exp(torch.tensor(total_loss / total_tokens)))
+
+
+def _benchmark_mode(model_name, mode, max_new_tokens, repeat, results):
+    """Measure one mode in a fresh process so RSS is not shared with other modes."""
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    model = load_quantized_model(model_name, mode)
+    load_seconds = time.perf_counter() - start
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    rss_after = process.memory_info().rss
+
+    inputs = tokenizer(EVAL_TEXTS[1], return_tensors="pt")
+    with torch.inference_mode():
+        model.generate(**inputs, max_new_tokens=8, do_sample=False,
+                       pad_token_id=tokenizer.eos_token_id)
+        tokens, seconds = 0, 0.0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = model.generate(**inputs, max_new_tokens=max_new_tokens,
+                                    min_new_tokens=max_new_tokens, do_sample=False,
+                                    pad_token_id=tokenizer.eos_token_id)
+            seconds += time.perf_counter() - start
+            tokens += output.shape[1] - inputs.input_ids.shape[1]
+
+    results.put({
+        "mode": mode,
+        "load_seconds": load_seconds,
+        "rss_mb": rss_after / 2**20,
+        "model_rss_mb": (rss_after - rss_before) / 2**20,
+        "tokens_per_second": tokens / seconds,
+        "perplexity": perplexity(model, tokenizer, EVAL_TEXTS),
+    })
+
+
+def _wait_for_result(worker, results, mode, poll_seconds: float = 5.0) -> dict:
+    """Get the worker's row, failing instead of hanging if it dies without one."""
+    while True:
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            if worker.is_alive():
+                continue
+        try:
+            # It may have exited right after sending its row
+            return results.get(timeout=1)
+        except queue.Empty:
+            raise RuntimeError(
+                f"Benchmark process for {mode} exited with code {worker.exitcode} before reporting"
+            ) from None
+
+
+def benchmark(model_name: str = "distilgpt2", modes=QUANTIZATION_MODES,
+              max_new_tokens: int = 64, repeat: int = 3) -> List[dict]:
+    """
+    Compares memory, generation speed and perplexity of each mode.
+
+    Returns
+    -------
+    List[dict]
+        One row per mode; `perplexity_delta` is relative to fp32.
+    """
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for mode in modes:
+        results = context.Queue()
+        worker = context.Process(
+            target=_benchmark_mode, args=(model_name, mode, max_new_tokens, repeat, results)
+        )
+        worker.start()
+        rows.append(_wait_for_result(worker, results, mode))
+        worker.join()
+
+    baseline = next((row for row in rows if row["mode"] == "fp32"), rows[0])
+    for row in rows:
+        row["perplexity_delta"] = row["perplexity"] - baseline["perplexity"]
+        row["speedup"] = row["tokens_per_second"] / baseline["tokens_per_second"]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reduced-precision CPU inference")
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--modes", nargs="+", default=list(QUANTIZATION_MODES), choices=QUANTIZATION_MODES)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"📏 Benchmarking {args.model} on {torch.get_num_threads()} CPU threads...\n")
+    rows = benchmark(args.model, args.modes, args.max_new_tokens, args.repeat)
+
+    print(f"{'mode':<6} {'load':>7} {'RSS':>9} {'model RSS':>10} {'tokens/s':>9} {'speedup':>8} "
+          f"{'perplexity':>11} {'delta':>8}")
+    for row in rows:
+        print(
+            f"{row['mode']:<6} {row['load_seconds']:>6.1f}s {row['rss_mb']:>6.0f} MB "
+            f"{row['model_rss_mb']:>7.0f} MB {row['tokens_per_second']:>9.1f} {row['speedup']:>7.2f}x "
+            f"{row['perplexity']:>11.2f} {row['perplexity_delta']:>+8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Speculative decoding: distilgpt2 drafts, a larger GPT-2 verifies.
+
+Each round the draft model proposes `k` tokens one at a time (cheap), then
+the target model scores all of them in a single forward pass. Draft token
+x is accepted with probability min(1, p(x) / q(x)), where p and q are the
+target and draft distributions; at the first rejection a replacement is
+drawn from norm(max(0, p - q)), and if all k are accepted one bonus token
+is drawn from the target. This makes the output distributed exactly as
+sampling from the target alone, while the target runs once per round
+instead of once per token.
+
+Both models must share a tokenizer (all GPT-2 checkpoints do). Plain
+temperature sampling is used; top-k/top-p would change the target
+distribution the guarantee refers to.
+
+    python speculative.py --target gpt2-medium --draft distilgpt2 --k 4
+"""
+
+import argparse
+import time
+from typing import List, Optional, Tuple
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
+
+
+class _CachedModel:
+    """A causal LM plus its KV cache, tracking how many tokens the cache covers."""
+
+    def __init__(self, model):
+        self.model = model
+        self.reset()
+
+    def reset(self):
+        self.cache = DynamicCache()
+        self.length = 0
+
+    def extend(self, ids: List[int]) -> torch.Tensor:
+        """Feed the tokens of `ids` not yet in the cache; return logits for each fed position."""
+        new = ids[self.length:]
+        outputs = self.model(
+            input_ids=torch.tensor([new], device=self.model.device),
+            past_key_values=self.cache,
+            use_cache=True,
+        )
+        self.cache = outputs.past_key_values
+        self.length = len(ids)
+        return outputs.logits[0].float()
+
+    def crop(self, length: int):
+        """Drop cached positions beyond `length` (rejected draft tokens)."""
+        if self.length > length:
+            self.cache.crop(length)
+            self.length = length
+
+
+def _probs(logits: torch.Tensor, temperature: float) -> torch.Tensor:
+    """Sampling distribution; one-hot on the argmax for temperature 0 (greedy)."""
+    if temperature <= 0:
+        return torch.nn.functional.one_hot(logits.argmax(-1), logits.shape[-1]).float()
+    return torch.softmax(logits / temperature, dim=-1)
+
+
+class SpeculativeDecoder:
+    """
+    Generates with a target model, using a smaller draft model to propose tokens.
+
+    Parameters
+    ----------
+    target_name : str
+        The model whose output distribution is reproduced.
+    draft_name : str
+        A smaller model with the same tokenizer.
+    k : int
+        Draft tokens proposed per verification round.
+    """
+
+    def __init__(self, target_name: str = "gpt2-medium", draft_name: str = "distilgpt2", k: int = 4):
+        self.tokenizer = AutoTokenizer.from_pretrained(target_name)
+        self.target = _CachedModel(AutoModelForCausalLM.from_pretrained(target_name).eval())
+        self.draft = _CachedModel(AutoModelForCausalLM.from_pretrained(draft_name).eval())
+        self.k = k
+        self.eos_token_id = self.tokenizer.eos_token_id
+        self.vocab_size = min(self.target.model.config.vocab_size, self.draft.model.config.vocab_size)
+        self.max_positions = min(self.target.model.config.n_positions, self.draft.model.config.n_positions)
+
+    @torch.inference_mode()
+    def generate(self, prompt: str, max_new_tokens: int = 64, temperature: float = 0.7,
+                 k: Optional[int] = None) -> Tuple[str, dict]:
+        """
+        Generates a continuation of `prompt`.
+
+        Parameters
+        ----------
+        prompt : str
+            Input text.
+        max_new_tokens : int
+            Number of tokens to generate.
+        temperature : float
+            Sampling temperature; 0 decodes greedily (identical to target greedy).
+        k : int, optional
+            Override the number of draft tokens per round.
+
+        Returns
+        -------
+        (str, dict)
+            The generated text (without the prompt), and stats: new_tokens,
+            drafted, accepted, acceptance_rate, target_passes, seconds and
+            tokens_per_second.
+        """
+        k = k or self.k
+        max_new_tokens = min(max_new_tokens, self.max_positions - 1)
+        ids = self.tokenizer.encode(prompt)[-(self.max_positions - max_new_tokens):] or [self.eos_token_id]
+        prompt_length = len(ids)
+        self.target.reset()
+        self.draft.reset()
+
+        drafted = accepted = target_passes = 0
+        start = time.perf_counter()
+
+        # Both caches cover everything but the last token, which each round feeds
+        if len(ids) > 1:
+            self.target.extend(ids[:-1])
+            self.draft.extend(ids[:-1])
+
+        while len(ids) - prompt_length < max_new_tokens:
+            remaining = max_new_tokens - (len(ids) - prompt_length)
+            steps = min(k, remaining - 1, self.max_positions - len(ids) - 1)
+
+            # Draft `steps` tokens autoregressively
+            proposal, draft_probs = [], []
+            for _ in range(steps):
+                logits = self.draft.extend(ids + proposal)[-1, :self.vocab_size]
+                q = _probs(logits, temperature)
+                proposal.append(int(torch.multinomial(q, 1)))
+                draft_probs.append(q)
+
+            # Score the last accepted token plus every draft token in one pass
+            target_logits = self.target.extend(ids + proposal)[-(steps + 1):, :self.vocab_size]
+            target_probs = _probs(target_logits, temperature)
+            target_passes += 1
+            drafted += steps
+
+            new_tokens = []
+            for i, token in enumerate(proposal):
+                p, q = target_probs[i], draft_probs[i]
+                if torch.rand(()) < torch.clamp(p[token] / q[token], max=1.0):
+                    new_tokens.append(token)
+                    continue
+                residual = torch.clamp(p - q, min=0)
+                new_tokens.append(int(torch.multinomial(residual / residual.sum(), 1)))
+                accepted += i
+                break
+            else:
+                # Every draft accepted: the target's next distribution is free
+                new_tokens.append(int(torch.multinomial(target_probs[steps], 1)))
+                accepted += steps
+
+            ids.extend(new_tokens)
+            # Rejected drafts must not stay in either cache
+            self.target.crop(len(ids) - 1)
+            self.draft.crop(len(ids) - 1)
+
+            if self.eos_token_id in new_tokens:
+                ids = ids[:len(ids) - len(new_tokens) + new_tokens.index(self.eos_token_id)]
+                break
+
+        seconds = time.perf_counter() - start
+        generated = ids[prompt_length:prompt_length + max_new_tokens]
+        return self.tokenizer.decode(generated), {
+            "new_tokens": len(generated),
+            "drafted": drafted,
+            "accepted": accepted,
+            "acceptance_rate": accepted / drafted if drafted else 0.0,
+            "target_passes": target_passes,
+            "seconds": seconds,
+            "tokens_per_second": len(generated) / seconds if seconds else 0.0,
+        }
+
+    @torch.inference_mode()
+    def generate_target_only(self, prompt: str, max_new_tokens: int = 64,
+                             temperature: float = 0.7) -> Tuple[str, dict]:
+        """Plain autoregressive sampling from the target, for comparison."""
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.target.model.device)
+        sampling = {"do_sample": False}
+        if temperature > 0:
+            # generate() applies top_k=50 by default; match plain temperature sampling
+            sampling = {"do_sample": True, "temperature": temperature, "top_k": 0, "top_p": 1.0}
+        start = time.perf_counter()
+        output = self.target.model.generate(
+            **inputs, max_new_tokens=max_new_tokens, pad_token_id=self.eos_token_id, **sampling
+        )
+        seconds = time.perf_counter() - start
+        generated = output[0, inputs.input_ids.shape[1]:].tolist()
+        if self.eos_token_id in generated:
+            generated = generated[:generated.index(self.eos_token_id)]
+        return self.tokenizer.decode(generated), {
+            "new_tokens": len(generated),
+            "seconds": seconds,
+            "tokens_per_second": len(generated) / seconds if seconds else 0.0,
+        }
+
+
+def speculative_demo(target_name: str = "gpt2-medium", draft_name: str = "distilgpt2",
+                     k_values=(2, 4, 6), max_new_tokens: int = 64, temperature: float = 0.7):
+    """
+    Compares target-only generation with speculative decoding for several k.
+    """
+    print(f"🤖 Loading target {target_name} and draft {draft_name}...")
+    decoder = SpeculativeDecoder(target_name, draft_name)
+    prompt = "The first astronaut to walk on the Moon"
+    decoder.generate(prompt, max_new_tokens=8, temperature=temperature)  # warmup
+
+    text, stats = decoder.generate_target_only(prompt, max_new_tokens, temperature)
+    baseline = stats["tokens_per_second"]
+    print(f"\n🔹 Prompt: {prompt}")
+    print(f"\n🎯 Target only: {baseline:.1f} tokens/sec")
+    print("🔸 Generated:", prompt + text)
+
+    for k in k_values:
+        text, stats = decoder.generate(prompt, max_new_tokens, temperature, k=k)
+        print(
+            f"\n⚡ Speculative k={k}: {stats['tokens_per_second']:.1f} tokens/sec "
+            f"({stats['tokens_per_second'] / baseline:.2f}x), acceptance {stats['acceptance_rate']:.0%}, "
+            f"{stats['target_passes']} target passes for {stats['new_tokens']} tokens"
+        )
+        print("🔸 Generated:", prompt + text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speculative decoding with a small draft model")
+    parser.add_argument("--target", default="gpt2-medium")
+    parser.add_argument("--draft", default="distilgpt2")
+    parser.add_argument("--k", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    args = parser.parse_args()
+
+    speculative_demo(args.target, args.draft, args.k, args.max_new_tokens, args.temperature)
+
+
+if __name__ == "__main__":
+    main()
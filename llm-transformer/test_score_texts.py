@@ -0,0 +1,67 @@
+"""
+Tests for `score_texts` on a tiny randomly initialised GPT-2 (no download needed).
+
+    python -m pytest test_score_texts.py
+"""
+
+import math
+from types import SimpleNamespace
+
+import pytest
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+from intro_transformer_enhanced import score_texts
+
+
+class CharTokenizer:
+    """One token per character; id 0 is EOS."""
+
+    eos_token_id = 0
+
+    def encode(self, text):
+        return [1 + ord(char) % 99 for char in text]
+
+
+@pytest.fixture(scope="module")
+def generator():
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=100, n_positions=32, n_embd=16, n_layer=1, n_head=2)
+    return SimpleNamespace(model=GPT2LMHeadModel(config).eval(), tokenizer=CharTokenizer())
+
+
+def test_empty_text_has_no_score(generator):
+    results = score_texts(generator, ["", "a", "hello"])
+
+    assert results[0] == {"mean_logprob": None, "perplexity": None, "tokens": 0}
+    for result, length in zip(results[1:], [1, 5]):
+        assert result["tokens"] == length
+        assert result["perplexity"] > 1.0
+        assert math.isclose(result["perplexity"], math.exp(-result["mean_logprob"]), rel_tol=1e-5)
+
+
+def test_batching_does_not_change_scores(generator):
+    texts = ["hello world", "", "a", "the quick brown fox"]
+    batched = score_texts(generator, texts, batch_size=4)
+    single = [score_texts(generator, [text])[0] for text in texts]
+
+    for a, b in zip(batched, single):
+        assert a["tokens"] == b["tokens"]
+        if b["mean_logprob"] is None:
+            assert a["mean_logprob"] is None
+        else:
+            assert math.isclose(a["mean_logprob"], b["mean_logprob"], abs_tol=1e-4)
+
+
+def test_long_text_scored_in_blocks_matches_full_logits(generator):
+    text = "the quick brown fox jumps over the lazy dog " * 3  # longer than n_positions
+    result = score_texts(generator, [text, "short"], logit_block=7)[0]
+
+    model, tokenizer = generator.model, generator.tokenizer
+    input_ids = torch.tensor([([tokenizer.eos_token_id] + tokenizer.encode(text))[:32]])
+    with torch.inference_mode():
+        logprobs = torch.log_softmax(model(input_ids=input_ids).logits[0, :-1], dim=-1)
+    expected = logprobs.gather(-1, input_ids[0, 1:, None]).mean().item()
+
+    assert result["tokens"] == 31
+    assert math.isclose(result["mean_logprob"], expected, abs_tol=1e-4)
@@ -0,0 +1,311 @@
+"""
+Multi-process generation pool for CPU inference.
+
+A small model like distilgpt2 does not get much faster with more torch
+intra-op threads, so a many-core machine is better used by several
+processes, each pinned to its own slice of cores with a matching thread
+count. Workers pull prompts from a shared queue, so a prompt always goes to
+the next idle worker.
+
+Each worker loads its own model copy (spawn), or with `share_model=True`
+the model is loaded once in the parent and inherited copy-on-write (fork,
+Linux/macOS only).
+
+Running this file measures throughput against the number of workers:
+
+    python worker_pool.py --model distilgpt2 --workers 1 2 4 8 --prompts 32
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import torch
+
+from intro_transformer_enhanced import create_simple_llm, generate_text
+
+# Set in the parent before forking when the model is shared copy-on-write
+_shared_generator = None
+
+
+def available_cores() -> List[int]:
+    """CPU ids this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cores(cores: List[int], workers: int) -> List[List[int]]:
+    """Split cores into `workers` contiguous, near-equal groups (shared round-robin if fewer cores)."""
+    if workers > len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    size, extra = divmod(len(cores), workers)
+    groups, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+def _worker_main(worker_id, model_name, cores, tasks, results, warmup_prompt):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+    try:
+        generator = _shared_generator or create_simple_llm(model_name)
+        tokenizer = generator.tokenizer
+        if warmup_prompt:
+            generate_text(generator, warmup_prompt, max_new_tokens=8)
+    except Exception as e:
+        results.put(("failed", worker_id, str(e)))
+        return
+    results.put(("ready", worker_id, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, prompt, kwargs = task
+        start = time.perf_counter()
+        try:
+            text = generate_text(generator, prompt, **kwargs)
+            new_tokens = len(tokenizer.encode(text)) - len(tokenizer.encode(prompt))
+            results.put(("done", task_id, {
+                "text": text,
+                "worker": worker_id,
+                "seconds": time.perf_counter() - start,
+                "new_tokens": new_tokens,
+            }))
+        except Exception as e:
+            results.put(("error", task_id, str(e)))
+
+
+class GenerationWorkerPool:
+    """
+    Pool of generation processes fed from one dispatch queue.
+
+    Parameters
+    ----------
+    model_name : str
+        Model passed to `create_simple_llm` in every worker.
+    workers : int, optional
+        Number of processes (default: one per available core).
+    share_model : bool
+        Load the model once in the parent and fork workers that share its
+        weights copy-on-write, instead of each worker loading its own copy.
+    pin_cores : bool
+        Pin each worker to a disjoint group of cores and size its torch
+        thread pool to match.
+    warmup_prompt : str, optional
+        Generated once by every worker before it reports ready, so the
+        first real prompts do not pay for one-time setup.
+    poll_seconds : float
+        How often to check that the workers are still alive while waiting
+        for them; if one dies, pending prompts fail instead of hanging.
+    """
+
+    def __init__(self, model_name: str = "distilgpt2", workers: Optional[int] = None,
+                 share_model: bool = False, pin_cores: bool = True,
+                 warmup_prompt: Optional[str] = None, poll_seconds: float = 1.0):
+        global _shared_generator
+
+        cores = available_cores()
+        self.workers = workers or len(cores)
+        self.core_groups = split_cores(cores, self.workers) if pin_cores else [cores] * self.workers
+        self.poll_seconds = poll_seconds
+        self._closing = False
+
+        if share_model:
+            # Must be loaded before forking; no inference may run in the parent
+            # first, or forked children can inherit a locked OpenMP pool
+            _shared_generator = create_simple_llm(model_name)
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context("spawn")
+
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.processes = [
+            context.Process(
+                target=_worker_main,
+                args=(i, model_name, self.core_groups[i], self.tasks, self.results, warmup_prompt),
+                daemon=True,
+            )
+            for i in range(self.workers)
+        ]
+        for process in self.processes:
+            process.start()
+        _shared_generator = None
+
+        try:
+            ready = 0
+            while ready < self.workers:
+                try:
+                    status, worker_id, error = self.results.get(timeout=self.poll_seconds)
+                except queue.Empty:
+                    self._check_workers()
+                    continue
+                if status == "failed":
+                    raise RuntimeError(f"Worker {worker_id} failed to load {model_name}: {error}")
+                ready += 1
+        except BaseException:
+            self.close()
+            raise
+
+        self._futures: Dict[int, Future] = {}
+        self._next_id = 0
+        self._broken: Optional[str] = None
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _check_workers(self):
+        """Raise if any worker process has exited."""
+        for worker_id, process in enumerate(self.processes):
+            if not process.is_alive():
+                raise RuntimeError(f"Worker {worker_id} exited with code {process.exitcode}")
+
+    def _fail_pending(self, error: str):
+        """Mark the pool broken and fail every prompt still waiting for a result."""
+        with self._lock:
+            self._broken = error
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            future.set_exception(RuntimeError(error))
+
+    def _collect(self):
+        while True:
+            try:
+                message = self.results.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                if self._closing:
+                    continue
+                try:
+                    self._check_workers()
+                except RuntimeError as e:
+                    # Which prompt the dead worker held is unknown, so none can be trusted
+                    self._fail_pending(str(e))
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            status, task_id, payload = message
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+            if future is None:
+                continue
+            if status == "done":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def submit(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.7) -> Future:
+        """
+        Queues a prompt for the next idle worker.
+
+        Returns
+        -------
+        Future
+            Resolves to a dict with `text`, `worker`, `seconds` and `new_tokens`.
+        """
+        future = Future()
+        with self._lock:
+            if self._broken:
+                raise RuntimeError(f"Worker pool is broken: {self._broken}")
+            task_id = self._next_id
+            self._next_id += 1
+            self._futures[task_id] = future
+        self.tasks.put((task_id, prompt, {"max_new_tokens": max_new_tokens, "temperature": temperature}))
+        return future
+
+    def map(self, prompts: List[str], **kwargs) -> List[dict]:
+        """Generates all prompts across the pool and returns results in input order."""
+        futures = [self.submit(prompt, **kwargs) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Stops the workers after the queued prompts are done."""
+        self._closing = True
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        self.results.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark_workers(model_name: str = "distilgpt2", worker_counts=(1, 2, 4), prompts: int = 16,
+                      max_new_tokens: int = 64, share_model: bool = False) -> List[dict]:
+    """
+    Measures generation throughput for each worker count.
+
+    Returns
+    -------
+    List[dict]
+        One row per worker count with threads per worker, wall time,
+        prompts/sec and generated tokens/sec.
+    """
+    base_prompts = ["The quick brown fox", "Once upon a time", "Python programming is",
+                    "The first astronaut to walk on the Moon"]
+    batch = (base_prompts * prompts)[:prompts]
+    rows = []
+    for workers in worker_counts:
+        with GenerationWorkerPool(model_name, workers, share_model=share_model,
+                                  warmup_prompt=base_prompts[0]) as pool:
+            start = time.perf_counter()
+            results = pool.map(batch, max_new_tokens=max_new_tokens)
+            seconds = time.perf_counter() - start
+            rows.append({
+                "workers": workers,
+                "threads_per_worker": len(pool.core_groups[0]),
+                "seconds": seconds,
+                "prompts_per_second": len(batch) / seconds,
+                "tokens_per_second": sum(r["new_tokens"] for r in results) / seconds,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the generation worker pool vs workers")
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="worker counts to try (default: powers of two up to the core count)")
+    parser.add_argument("--prompts", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--share-model", action="store_true", help="fork workers from one loaded model")
+    args = parser.parse_args()
+
+    cores = len(available_cores())
+    worker_counts = args.workers or [2**i for i in range(cores.bit_length()) if 2**i <= cores]
+    print(f"🧵 {cores} cores available, trying {worker_counts} workers...")
+
+    rows = benchmark_workers(args.model, worker_counts, args.prompts, args.max_new_tokens, args.share_model)
+
+    print(f"\n{'workers':>7} {'threads/worker':>15} {'seconds':>8} {'prompts/s':>10} {'tokens/s':>9}")
+    for row in rows:
+        print(
+            f"{row['workers']:>7} {row['threads_per_worker']:>15} {row['seconds']:>8.2f} "
+            f"{row['prompts_per_second']:>10.2f} {row['tokens_per_second']:>9.1f}"
+        )
+    best = max(rows, key=lambda row: row["tokens_per_second"])
+    print(f"\n✅ Best throughput with {best['workers']} workers x {best['threads_per_worker']} threads")
+
+
+if __name__ == "__main__":
+    main()
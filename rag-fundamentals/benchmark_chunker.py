@@ -0,0 +1,104 @@
+"""Throughput and peak memory of the PDF chunkers on a large text.
+
+Compares the original create_chunks, the offset-based span generator
+(with and without batched text copies) and LangChain's
+RecursiveCharacterTextSplitter on the text of a PDF repeated N times.
+
+Usage:
+    python benchmark_chunker.py                        # DeepSeek_R1.pdf x 50
+    python benchmark_chunker.py my.pdf --repeat-text 10
+"""
+
+import argparse
+import hashlib
+import time
+import tracemalloc
+import uuid
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from pdf_extract import extract_text
+from rag_streamlit_pdf import CHUNK_OVERLAP, CHUNK_SIZE, SimplePDFProcessor
+
+
+class NamedSource:
+    """Stands in for a Streamlit upload, which chunk metadata reads `.name` from;
+    the content hash is passed to the chunkers separately"""
+
+    def __init__(self, name):
+        self.name = name
+
+
+def legacy_create_chunks(text, pdf_file, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """The original SimplePDFProcessor.create_chunks, for reference"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if start > 0:
+            start = start - chunk_overlap
+        chunk = text[start:end]
+        if end < len(text):
+            last_period = chunk.rfind(".")
+            if last_period != -1:
+                chunk = chunk[: last_period + 1]
+                end = start + last_period + 1
+        chunks.append(
+            {"id": str(uuid.uuid4()), "text": chunk, "metadata": {"source": pdf_file.name}}
+        )
+        start = end
+    return chunks
+
+
+def measure(name, text, fn):
+    """Run `fn` once under tracemalloc and print throughput and peak memory"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mb = len(text) / 2**20
+    print(
+        f"{name:<32} {count:>8} chunks  {seconds * 1000:9.1f} ms  "
+        f"{mb / seconds:7.1f} MB/s  peak {peak / 2**20:8.2f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?", default="DeepSeek_R1.pdf")
+    parser.add_argument("--repeat-text", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    text = extract_text(args.pdf, backend="pypdfium2").text * args.repeat_text
+    source = NamedSource(args.pdf)
+    with open(args.pdf, "rb") as file:
+        source_hash = hashlib.sha256(file.read()).hexdigest()
+    processor = SimplePDFProcessor()
+    print(f"{len(text) / 2**20:.1f} MB of text, chunk size {CHUNK_SIZE}, overlap {CHUNK_OVERLAP}\n")
+
+    measure("legacy create_chunks", text, lambda: len(legacy_create_chunks(text, source)))
+    measure("create_chunks", text, lambda: len(processor.create_chunks(text, source, source_hash)))
+    measure("iter_spans (offsets only)", text, lambda: sum(1 for _ in processor.iter_spans(text)))
+    measure(
+        f"iter_chunk_batches ({args.batch_size})",
+        text,
+        lambda: sum(
+            len(batch)
+            for batch in processor.iter_chunk_batches(
+                text, source, args.batch_size, source_hash
+            )
+        ),
+    )
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+    measure("RecursiveCharacterTextSplitter", text, lambda: len(splitter.split_text(text)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Result export shared by the benchmark scripts.
+
+Used by benchmark_rag_pipeline.py here and by
+llm-transformer/benchmark_generation.py, so every benchmark writes the
+same JSON/CSV layout with the commit it ran on.
+"""
+
+import csv
+import json
+import os
+import subprocess
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def export(rows, meta, prefix, **sections):
+    """Write `{prefix}.json` (meta, results and any extra sections) and
+    `{prefix}.csv` (one line per result row). With no rows, e.g. when every
+    case was skipped, only the JSON is written."""
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    with open(f"{prefix}.json", "w") as file:
+        json.dump({"meta": meta, "results": rows, **sections}, file, indent=2)
+    if not rows:
+        # Drop a CSV left by an earlier run so it is not mistaken for this one's
+        if os.path.exists(f"{prefix}.csv"):
+            os.remove(f"{prefix}.csv")
+        print(f"\n⚠️  No results to export; wrote {prefix}.json only")
+        return
+    with open(f"{prefix}.csv", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\nResults written to {prefix}.json and {prefix}.csv")
@@ -0,0 +1,75 @@
+"""Compare PDF text extraction backends, serial and in a process pool.
+
+Usage:
+    python benchmark_pdf_extract.py                    # DeepSeek_R1.pdf
+    python benchmark_pdf_extract.py my.pdf --repeat 5 --workers 8
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import PyPDF2
+
+from pdf_extract import BACKENDS, extract_text, page_count
+
+
+def legacy_read_pdf(path):
+    """The original SimplePDFProcessor.read_pdf, for reference"""
+    reader = PyPDF2.PdfReader(path)
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return text
+
+
+def median_time(repeat, fn):
+    """Return (median seconds, last result) over `repeat` runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?", default="DeepSeek_R1.pdf")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--pages-per-task", type=int, default=4)
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as file:
+        data = file.read()
+    pages = page_count(data, "pypdf2")
+    print(f"{args.pdf}: {pages} pages, {len(data) / 2**20:.1f} MB, {args.workers} workers\n")
+
+    legacy_s, legacy_text = median_time(args.repeat, lambda: legacy_read_pdf(args.pdf))
+    print(f"{'legacy read_pdf':<28} {legacy_s * 1000:9.1f} ms  {len(legacy_text):>8} chars")
+
+    for backend in BACKENDS:
+        for workers in sorted({1, args.workers}):
+            seconds, extracted = median_time(
+                args.repeat,
+                # min_pool_pages=0: measure the pool even where extract_text
+                # would choose serial reading for a document this small
+                lambda: extract_text(
+                    data,
+                    backend,
+                    workers=workers,
+                    pages_per_task=args.pages_per_task,
+                    min_pool_pages=0,
+                ),
+            )
+            label = f"{backend} x{workers}"
+            print(
+                f"{label:<28} {seconds * 1000:9.1f} ms  {len(extracted.text):>8} chars  "
+                f"{pages / seconds:7.1f} pages/s  {legacy_s / seconds:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Per-stage latency benchmark for the simple_rag pipeline.
+
+Runs a query set through embedding -> search -> prompt -> generation for
+every embedding/LLM backend pair and reports p50/p95/p99 per stage.
+
+By default the OpenAI and Ollama endpoints are replaced by the
+deterministic local stub in stub_llm_server.py, so runs are offline and
+comparable across commits. Pass --live to hit the real endpoints. The
+`chroma` embedding backend always runs locally (it needs its ONNX model
+to be cached for a fully offline run).
+
+Usage:
+    python benchmark_rag_pipeline.py --runs 20 --output results/rag_latency
+    python benchmark_rag_pipeline.py --embeddings openai nomic --llms ollama --stub-latency-ms 40
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from benchmark_export import export, git_commit
+
+STAGES = ["embed_query", "search", "build_prompt", "generate", "total"]
+PERCENTILES = [50, 95, 99]
+
+DEFAULT_QUERIES = [
+    "What is the Hubble Space Telescope?",
+    "Tell me about Mars exploration.",
+    "Who was the first human to orbit Earth?",
+    "When did humans first land on the Moon?",
+    "What is special about black holes?",
+]
+
+
+def load_queries(path):
+    if not path:
+        return DEFAULT_QUERIES
+    with open(path) as file:
+        if path.endswith(".json"):
+            return json.load(file)
+        return [line.strip() for line in file if line.strip()]
+
+
+def run_query(simple_rag, query, embedding_model, collection, llm_model, top_k):
+    """Run one query through the pipeline, returning milliseconds per stage"""
+    timings = {}
+    start = stage_start = time.perf_counter()
+
+    def lap(stage):
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[stage] = (now - stage_start) * 1000
+        stage_start = now
+
+    query_embedding = embedding_model.embedding_fn([query])[0]
+    lap("embed_query")
+    related_chunks = simple_rag.find_related_chunks(
+        query, collection, top_k, query_embedding=query_embedding
+    )
+    lap("search")
+    messages = simple_rag.build_messages(simple_rag.augment_prompt(query, related_chunks))
+    lap("build_prompt")
+    response = llm_model.generate_completion(messages)
+    lap("generate")
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return timings, response.startswith("Error generating response")
+
+
+def summarize(samples):
+    rows = []
+    for (embedding, llm), stages in samples.items():
+        for stage in STAGES:
+            values = np.array(stages[stage])
+            row = {
+                "embedding": embedding,
+                "llm": llm,
+                "stage": stage,
+                "n": len(values),
+                "mean_ms": round(float(values.mean()), 3),
+            }
+            for p in PERCENTILES:
+                row[f"p{p}_ms"] = round(float(np.percentile(values, p)), 3)
+            rows.append(row)
+    return rows
+
+
+def print_table(rows, errors):
+    print(f"\n{'embedding':<10} {'llm':<8} {'stage':<13} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in rows:
+        print(
+            f"{row['embedding']:<10} {row['llm']:<8} {row['stage']:<13} "
+            f"{row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f}"
+        )
+    for (embedding, llm), count in errors.items():
+        if count:
+            print(f"⚠️  {embedding}/{llm}: {count} generation errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark for rag_pipeline")
+    parser.add_argument("--embeddings", nargs="+", default=["openai", "chroma", "nomic"])
+    parser.add_argument("--llms", nargs="+", default=["openai", "ollama"])
+    parser.add_argument("--runs", type=int, default=10, help="passes over the query set")
+    parser.add_argument("--top-k", type=int, default=2)
+    parser.add_argument("--queries", help="JSON list or one query per line")
+    parser.add_argument("--csv", default="space_facts.csv", help="facts to index")
+    parser.add_argument("--live", action="store_true", help="use the real OpenAI/Ollama endpoints")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", default="benchmark_results/rag_pipeline")
+    args = parser.parse_args()
+
+    server = None
+    if not args.live:
+        from stub_llm_server import start_background_server
+
+        server, base_url = start_background_server(args.stub_latency_ms)
+        # Must be set before simple_rag is imported and the clients are created
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ["OLLAMA_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        print(f"Using offline stub endpoints at {base_url}")
+
+    import simple_rag
+
+    queries = load_queries(args.queries)
+    samples = defaultdict(lambda: defaultdict(list))
+    errors = defaultdict(int)
+
+    # Throwaway collections, kept out of the apps' ./chroma_db
+    chroma_dir = tempfile.TemporaryDirectory()
+    try:
+        for embedding_type in args.embeddings:
+            embedding_model = simple_rag.EmbeddingModel(embedding_type)
+            with contextlib.redirect_stdout(io.StringIO()):
+                collection = simple_rag.create_collection(embedding_model, chroma_dir.name)
+                simple_rag.ingest_csv(collection, args.csv)
+
+            for llm_type in args.llms:
+                llm_model = simple_rag.LLMModel(llm_type)
+                print(f"Benchmarking {embedding_type} embeddings + {llm_type} LLM...")
+
+                for _ in range(args.runs):
+                    for query in queries:
+                        # The pipeline prints every step; keep only the timings
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            timings, failed = run_query(
+                                simple_rag, query, embedding_model, collection, llm_model, args.top_k
+                            )
+                        for stage, ms in timings.items():
+                            samples[(embedding_type, llm_type)][stage].append(ms)
+                        errors[(embedding_type, llm_type)] += failed
+    finally:
+        chroma_dir.cleanup()
+        if server:
+            server.shutdown()
+
+    rows = summarize(samples)
+    print_table(rows, errors)
+    meta = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": args.runs,
+        "queries": len(queries),
+        "top_k": args.top_k,
+        "endpoints": "live" if args.live else "stub",
+        "stub_latency_ms": None if args.live else args.stub_latency_ms,
+        "errors": {f"{e}/{l}": count for (e, l), count in errors.items()},
+    }
+    export(rows, meta, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Compare the NumPy exact-search index with ChromaDB on the same embeddings.
+
+Usage:
+    python benchmark_vector_index.py                      # space_facts.csv, Chroma default embeddings
+    python benchmark_vector_index.py --embedding openai
+    python benchmark_vector_index.py --synthetic 100000   # random vectors, no embedding model needed
+    python benchmark_vector_index.py --quantization       # float16/int8 memory and recall report
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+import pandas as pd
+
+from vector_index import STORAGE_TYPES, NumpyVectorIndex, normalize
+
+QUERIES = [
+    "What is the Hubble Space Telescope?",
+    "Tell me about Mars exploration.",
+    "Who was the first person in space?",
+    "Which spacecraft has travelled the farthest?",
+]
+
+
+def load_corpus(args):
+    """Return (documents, document embeddings, query embeddings)"""
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        documents = [f"document {i}" for i in range(args.synthetic)]
+        doc_embeddings = rng.standard_normal((args.synthetic, args.dim), dtype=np.float32)
+        query_embeddings = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+        return documents, doc_embeddings, query_embeddings
+
+    from simple_rag import EmbeddingModel
+
+    embedding_fn = EmbeddingModel(args.embedding).embedding_fn
+    documents = pd.read_csv(args.csv)["fact"].tolist()
+    doc_embeddings = np.asarray(embedding_fn(documents), dtype=np.float32)
+    queries = (QUERIES * (args.queries // len(QUERIES) + 1))[: args.queries]
+    query_embeddings = np.asarray(embedding_fn(queries), dtype=np.float32)
+    return documents, doc_embeddings, query_embeddings
+
+
+def time_queries(query_fn, query_embeddings):
+    """Return per-query latencies in milliseconds and the returned ids"""
+    latencies, ids = [], []
+    for embedding in query_embeddings:
+        start = time.perf_counter()
+        results = query_fn(embedding)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(results["ids"][0])
+    return latencies, ids
+
+
+def report(name, build_s, load_s, latencies):
+    print(
+        f"{name:<8} build {build_s * 1000:9.1f} ms | load {load_s * 1000:8.2f} ms | "
+        f"query p50 {statistics.median(latencies):7.3f} ms | "
+        f"p95 {np.percentile(latencies, 95):7.3f} ms"
+    )
+
+
+def quantization_report(ids, documents, doc_embeddings, query_embeddings, args):
+    """Memory and recall@k of each storage type against the float32 index.
+
+    Every index is saved and reopened first, so memory is measured in the
+    state a loaded index is queried in: quantized codes in RAM, float32
+    vectors memory-mapped on disk.
+    """
+    recall_header = f"recall@{args.top_k}"
+    print(
+        f"{'storage':<8} {'rescore':>7} {'memory':>10} {'saved':>6} "
+        f"{recall_header:>9} {'p50 ms':>8}"
+    )
+
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage in STORAGE_TYPES:
+            index = NumpyVectorIndex(path=f"{tmp}/{storage}", storage=storage)
+            index.add(ids=ids, documents=documents, embeddings=doc_embeddings)
+            index.save()
+
+            for rescore_factor in ([0] if storage == "float32" else [0, args.rescore_factor]):
+                index = NumpyVectorIndex(
+                    path=f"{tmp}/{storage}", storage=storage, rescore_factor=rescore_factor
+                )
+                reference = report_storage(index, reference, query_embeddings, args)
+
+
+def report_storage(index, reference, query_embeddings, args):
+    """Print one quantization_report row; return the reference (ids, bytes)"""
+    latencies, result_ids = time_queries(
+        lambda q: index.query(query_embeddings=[q], n_results=args.top_k),
+        query_embeddings,
+    )
+
+    if reference is None:
+        reference = result_ids, index.memory_bytes()
+    reference_ids, baseline_bytes = reference
+    recall = statistics.mean(
+        len(set(r) & set(e)) / len(e) for r, e in zip(result_ids, reference_ids)
+    )
+    saved = 1 - index.memory_bytes() / baseline_bytes
+    print(
+        f"{index.storage:<8} {index.rescore_factor or '-':>7} "
+        f"{index.memory_bytes() / 2**20:8.1f}MB {saved:6.0%} "
+        f"{recall:9.3f} {statistics.median(latencies):8.3f}"
+    )
+    return reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--embedding", default="chroma", choices=["openai", "chroma", "nomic"])
+    parser.add_argument("--csv", default="space_facts.csv")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of random documents")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=2)
+    parser.add_argument("--quantization", action="store_true", help="report quantized storage trade-offs")
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    documents, doc_embeddings, query_embeddings = load_corpus(args)
+    ids = [str(i) for i in range(len(documents))]
+    # Both backends see identical unit vectors, so any difference is the search
+    doc_embeddings = normalize(doc_embeddings)
+    query_embeddings = normalize(query_embeddings)
+    print(f"{len(documents)} documents, {len(query_embeddings)} queries, top-{args.top_k}\n")
+
+    if args.quantization:
+        quantization_report(ids, documents, doc_embeddings, query_embeddings, args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # --- ChromaDB ---
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=f"{tmp}/chroma")
+        collection = client.create_collection("benchmark")
+        batch = 5000  # stay under Chroma's maximum batch size
+        for i in range(0, len(ids), batch):
+            collection.add(
+                ids=ids[i : i + batch],
+                documents=documents[i : i + batch],
+                embeddings=doc_embeddings[i : i + batch],
+            )
+        chroma_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        collection = chromadb.PersistentClient(path=f"{tmp}/chroma").get_collection("benchmark")
+        chroma_load = time.perf_counter() - start
+
+        chroma_latencies, chroma_ids = time_queries(
+            lambda q: collection.query(query_embeddings=[q], n_results=args.top_k),
+            query_embeddings,
+        )
+
+        # --- NumPy ---
+        start = time.perf_counter()
+        index = NumpyVectorIndex(path=f"{tmp}/numpy")
+        index.add(ids=ids, documents=documents, embeddings=doc_embeddings)
+        index.save()
+        numpy_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = NumpyVectorIndex(path=f"{tmp}/numpy")
+        numpy_load = time.perf_counter() - start
+
+        numpy_latencies, numpy_ids = time_queries(
+            lambda q: index.query(query_embeddings=[q], n_results=args.top_k),
+            query_embeddings,
+        )
+
+        start = time.perf_counter()
+        index.query(query_embeddings=query_embeddings, n_results=args.top_k)
+        batched_ms = (time.perf_counter() - start) * 1000
+
+    report("chroma", chroma_build, chroma_load, chroma_latencies)
+    report("numpy", numpy_build, numpy_load, numpy_latencies)
+    print(
+        f"\nnumpy batched: {len(query_embeddings)} queries in {batched_ms:.2f} ms "
+        f"({batched_ms / len(query_embeddings):.4f} ms/query)"
+    )
+
+    # The NumPy index is exact, so it is the reference for Chroma's recall
+    overlap = [
+        len(set(c) & set(n)) / len(n) for c, n in zip(chroma_ids, numpy_ids) if n
+    ]
+    print(f"Chroma recall@{args.top_k} vs exact search: {statistics.mean(overlap):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Pick per-embedding-model relevance thresholds from labelled queries.
+
+Each labelled query says whether the indexed documents can answer it
+(`"relevant": true`) or not. For every embedding model the facts CSV is
+indexed (or an existing collection is opened), the distance of each
+query's nearest chunk is recorded, and the threshold that best separates
+answerable from unanswerable queries (highest accuracy, then the largest
+margin) is reported in a form that can be pasted into DISTANCE_THRESHOLDS.
+
+Thresholds only hold for chunks like the ones they were calibrated on, so
+calibrate the PDF app against its own `documents_<model>` collections,
+with queries labelled for the PDFs uploaded there.
+
+Usage:
+    python calibrate_thresholds.py
+    python calibrate_thresholds.py --models openai chroma --queries my_queries.json
+    python calibrate_thresholds.py --collection "documents_{model}" --queries pdf_queries.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+
+import chromadb
+
+import simple_rag
+
+
+def nearest_distances(embedding_type, csv_path, queries, collection_name=None,
+                      chroma_path=simple_rag.CHROMA_PATH):
+    """Distance from each query to its closest chunk, in `collection_name`
+    of `chroma_path` if given, otherwise in a temporary collection of the
+    CSV's facts"""
+    embedding_model = simple_rag.EmbeddingModel(embedding_type)
+    with tempfile.TemporaryDirectory() as tmp:
+        if collection_name:
+            collection = chromadb.PersistentClient(path=chroma_path).get_collection(
+                collection_name, embedding_function=embedding_model.embedding_fn
+            )
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                collection = simple_rag.create_collection(embedding_model, tmp)
+                simple_rag.ingest_csv(collection, csv_path)
+
+        results = collection.query(query_texts=[q["query"] for q in queries], n_results=1)
+    return [distances[0] for distances in results["distances"]]
+
+
+def best_threshold(distances, labels):
+    """Return (threshold, accuracy) of the best cut between sorted distances.
+
+    Candidates are midpoints between neighbouring distances, plus one cut
+    below and above everything. Ties on accuracy go to the cut with the
+    widest gap around it, which is the least sensitive to noise.
+    """
+    points = sorted(distances)
+    candidates = [points[0] - 1e-6, points[-1] + 1e-6]
+    candidates += [(a + b) / 2 for a, b in zip(points, points[1:]) if a != b]
+
+    def score(threshold):
+        correct = sum((d <= threshold) == label for d, label in zip(distances, labels))
+        margin = min(abs(d - threshold) for d in distances)
+        return correct / len(labels), margin
+
+    threshold = max(candidates, key=score)
+    return threshold, score(threshold)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=["openai", "chroma", "nomic"])
+    parser.add_argument("--queries", default="calibration_queries.json")
+    parser.add_argument("--csv", default="space_facts.csv")
+    parser.add_argument(
+        "--collection",
+        help='existing collection to calibrate instead of the CSV, e.g. "documents_{model}"',
+    )
+    parser.add_argument("--chroma-path", default=simple_rag.CHROMA_PATH)
+    args = parser.parse_args()
+
+    with open(args.queries) as file:
+        queries = json.load(file)
+    labels = [q["relevant"] for q in queries]
+
+    thresholds = {}
+    for embedding_type in args.models:
+        try:
+            collection_name = args.collection and args.collection.format(model=embedding_type)
+            distances = nearest_distances(
+                embedding_type, args.csv, queries, collection_name, args.chroma_path
+            )
+        except Exception as e:
+            print(f"⚠️  Skipping {embedding_type}: {str(e)}")
+            continue
+
+        threshold, accuracy = best_threshold(distances, labels)
+        thresholds[embedding_type] = round(threshold, 3)
+
+        relevant = [d for d, label in zip(distances, labels) if label]
+        unrelated = [d for d, label in zip(distances, labels) if not label]
+        print(f"\n{embedding_type}:")
+        if relevant:
+            print(f"  answerable   nearest distance {min(relevant):.3f} - {max(relevant):.3f}")
+        if unrelated:
+            print(f"  unanswerable nearest distance {min(unrelated):.3f} - {max(unrelated):.3f}")
+        print(f"  threshold {threshold:.3f} -> accuracy {accuracy:.1%}")
+
+    print("\nDISTANCE_THRESHOLDS =", json.dumps(thresholds, indent=4))
+
+
+if __name__ == "__main__":
+    main()
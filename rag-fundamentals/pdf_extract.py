@@ -0,0 +1,169 @@
+import importlib.util
+import io
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BACKENDS = ("pypdf2", "pypdf", "pypdfium2")
+# Several times faster than the pure-Python readers when installed
+DEFAULT_BACKEND = "pypdfium2" if importlib.util.find_spec("pypdfium2") else "pypdf2"
+
+# Smallest document worth a process pool, per backend. Spawning a worker
+# and importing the backend in it costs a few hundred ms, so the pool only
+# pays off once serial extraction takes around two seconds (measured on
+# DeepSeek_R1.pdf: pypdf2 ~15 ms/page, pypdf ~28 ms/page, pypdfium2 ~2 ms/page)
+POOL_MIN_PAGES = {"pypdf2": 128, "pypdf": 64, "pypdfium2": 1024}
+
+# text: every page followed by "\n"; page_offsets[i]: where page i starts in text
+ExtractedText = namedtuple("ExtractedText", ["text", "page_offsets"])
+
+# Set in each pool worker by _init_worker so the PDF bytes are sent once
+_worker_data = None
+
+
+def _read_bytes(pdf):
+    """Accept raw bytes, a path, or a file-like object (e.g. a Streamlit upload)"""
+    if isinstance(pdf, (bytes, bytearray)):
+        return bytes(pdf)
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, "rb") as file:
+            return file.read()
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    pdf.seek(0)
+    return pdf.read()
+
+
+def _open(data, backend):
+    if backend == "pypdf2":
+        import PyPDF2
+
+        return PyPDF2.PdfReader(io.BytesIO(data))
+    if backend == "pypdf":
+        import pypdf
+
+        return pypdf.PdfReader(io.BytesIO(data))
+    if backend == "pypdfium2":
+        import pypdfium2
+
+        return pypdfium2.PdfDocument(data)
+    raise ValueError(f"Unknown PDF backend {backend!r}, expected one of {BACKENDS}")
+
+
+def page_count(data, backend):
+    document = _open(data, backend)
+    try:
+        return _page_count(document, backend)
+    finally:
+        _close(document, backend)
+
+
+def _page_count(document, backend):
+    return len(document) if backend == "pypdfium2" else len(document.pages)
+
+
+def _extract_pages(document, backend, start, stop):
+    """Return the text of pages [start, stop) of an open document"""
+    if backend != "pypdfium2":
+        return [document.pages[i].extract_text() or "" for i in range(start, stop)]
+
+    texts = []
+    for i in range(start, stop):
+        page = document[i]
+        text_page = page.get_textpage()
+        texts.append(text_page.get_text_range())
+        text_page.close()
+        page.close()
+    return texts
+
+
+def _close(document, backend):
+    if backend == "pypdfium2":
+        document.close()
+
+
+def extract_range(data, backend, start, stop):
+    """Return the text of pages [start, stop) as a list of strings"""
+    document = _open(data, backend)
+    try:
+        return _extract_pages(document, backend, start, stop)
+    finally:
+        _close(document, backend)
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _extract_range_in_worker(backend, start, stop):
+    return start, extract_range(_worker_data, backend, start, stop)
+
+
+def extract_text(pdf, backend=None, workers=None, pages_per_task=16, progress=None,
+                 min_pool_pages=None):
+    """Extract all page text from a PDF, in parallel for large documents.
+
+    `backend` defaults to DEFAULT_BACKEND. Documents of at least
+    `min_pool_pages` pages (default: POOL_MIN_PAGES for the backend) are
+    split into ranges of `pages_per_task` pages and spread over a process
+    pool of `workers` processes (default: CPU count, at most one per
+    range); smaller documents, or a single worker, are read serially from
+    one open document, which is faster than paying for the pool start-up.
+    Pages are joined once at the end, and `progress(pages_done,
+    total_pages)` is called as ranges complete.
+    """
+    backend = backend or DEFAULT_BACKEND
+    data = _read_bytes(pdf)
+    document = _open(data, backend)
+    total = _page_count(document, backend)
+    tasks = -(-total // pages_per_task)
+    workers = min(workers or os.cpu_count() or 1, tasks)
+    if min_pool_pages is None:
+        min_pool_pages = POOL_MIN_PAGES[backend]
+    pages = [None] * total
+
+    if workers <= 1 or total < min_pool_pages:
+        try:
+            for start in range(0, total, pages_per_task):
+                stop = min(start + pages_per_task, total)
+                pages[start:stop] = _extract_pages(document, backend, start, stop)
+                if progress:
+                    progress(stop, total)
+        finally:
+            _close(document, backend)
+    else:
+        _close(document, backend)
+        done = 0
+        # Spawned, not forked: callers such as the Streamlit app run this from
+        # a background thread of a multi-threaded server, and a forked child
+        # can inherit a lock another thread held and deadlock
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(data,),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _extract_range_in_worker,
+                    backend,
+                    start,
+                    min(start + pages_per_task, total),
+                )
+                for start in range(0, total, pages_per_task)
+            ]
+            for future in as_completed(futures):
+                start, texts = future.result()
+                pages[start : start + len(texts)] = texts
+                done += len(texts)
+                if progress:
+                    progress(done, total)
+
+    page_offsets = []
+    offset = 0
+    for page in pages:
+        page_offsets.append(offset)
+        offset += len(page) + 1
+    return ExtractedText("".join(page + "\n" for page in pages), page_offsets)
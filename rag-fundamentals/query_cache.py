@@ -0,0 +1,61 @@
+import pickle
+from collections import OrderedDict
+
+
+class QueryCache:
+    """Size-capped LRU cache for RAG answers.
+
+    Streamlit reruns the whole script on every widget interaction, so the
+    same question is otherwise retrieved and generated again each time an
+    expander or radio button is clicked. Keys should include everything the
+    answer depends on, including `collection_version`, so adding documents
+    makes old entries unreachable; they then age out of the LRU.
+    """
+
+    def __init__(self, max_bytes=5 * 2**20, max_entries=256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (value, size in bytes)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value for `key`, or None"""
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, value):
+        """Cache `value`, evicting least recently used entries to fit"""
+        size = len(pickle.dumps(value))
+        if size > self.max_bytes:
+            return  # would evict everything else; not worth caching
+
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes or len(self.entries) > self.max_entries:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+
+def collection_version(collection):
+    """Cheap fingerprint that changes whenever documents are added"""
+    return collection.name, collection.count()
+
+
+def session_query_cache(session_state, **kwargs):
+    """Return this Streamlit session's QueryCache, creating it on first use"""
+    if "query_cache" not in session_state:
+        session_state.query_cache = QueryCache(**kwargs)
+    return session_state.query_cache
@@ -1,17 +1,22 @@
 import streamlit as st
 import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import chromadb
 from chromadb.utils import embedding_functions
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
+from query_cache import collection_version, session_query_cache
 
 
 # Suppress tokenizer warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 load_dotenv()
 
+EMBEDDING_TYPES = ["nomic", "chroma", "openai"]
+
 # === Embedding Model Setup ===
 class EmbeddingModel:
     def __init__(self, model_type="openai"):
@@ -100,21 +105,91 @@ def generate_csv():
 
 
 # === ChromaDB Setup ===
-def setup_chromadb(documents, embedding_model):
-    client = chromadb.Client()
-
-    try:
-        client.delete_collection("space_facts")
-    except:
-        pass
-
-    collection = client.create_collection(
-        name="space_facts", embedding_function=embedding_model.embedding_fn
-    )
+class FactCollections:
+    """One persistent `space_facts_<model>` collection per embedding model.
+
+    Collections are built at most once per process (and only re-embed facts
+    that are missing or changed on disk), so switching embedding models is a
+    dictionary lookup once a collection is ready. Builds run on a small
+    thread pool, letting models the user has not picked yet be prepared in
+    the background. A failed build (no API key, Ollama not running) is
+    remembered and only retried when asked for with `retry=True`.
+    """
+
+    def __init__(self, documents, path="./chroma_db"):
+        self.documents = documents
+        self.client = chromadb.PersistentClient(path=path)
+        self.collections = {}
+        self.builds = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prebuild")
+
+    def _build(self, model_type):
+        embedding_model = EmbeddingModel(model_type)
+        collection = self.client.get_or_create_collection(
+            name=f"space_facts_{model_type}",
+            embedding_function=embedding_model.embedding_fn,
+            metadata={"model": model_type},
+        )
 
-    collection.add(documents=documents, ids=[str(i) for i in range(len(documents))])
+        ids = [str(i) for i in range(len(self.documents))]
+        stored = collection.get(ids=ids, include=["documents"])
+        stored = dict(zip(stored["ids"], stored["documents"]))
+        stale = [i for i, doc in zip(ids, self.documents) if stored.get(i) != doc]
+        if stale:
+            collection.upsert(
+                ids=stale, documents=[self.documents[int(i)] for i in stale]
+            )
 
-    return collection
+        with self.lock:
+            self.collections[model_type] = collection
+        return collection
+
+    def _submit(self, model_type, retry=False):
+        """Start a build unless one exists; a failed one is replaced only
+        with `retry` (lock held)"""
+        future = self.builds.get(model_type)
+        failed = future is not None and future.done() and future.exception() is not None
+        if future is None or (retry and failed):
+            future = self.executor.submit(self._build, model_type)
+            self.builds[model_type] = future
+        return future
+
+    def prebuild(self, model_types, retry=False):
+        """Build any of `model_types` that have not been tried yet (or that
+        failed, with `retry`) in the background"""
+        with self.lock:
+            for model_type in model_types:
+                if model_type not in self.collections:
+                    self._submit(model_type, retry)
+
+    def get(self, model_type):
+        """Return the collection, waiting for its build only the first time;
+        raises the build's error if it failed"""
+        with self.lock:
+            if model_type in self.collections:
+                return self.collections[model_type]
+            future = self._submit(model_type)
+        return future.result()
+
+    def status(self):
+        """Map each model with a build to ready, building or failed"""
+        states = {}
+        with self.lock:
+            for model_type, future in self.builds.items():
+                if model_type in self.collections:
+                    states[model_type] = "ready"
+                elif future.done():
+                    states[model_type] = "failed"
+                else:
+                    states[model_type] = "building"
+        return states
+
+
+@st.cache_resource
+def get_fact_collections():
+    """Shared by every session of this Streamlit process"""
+    return FactCollections([fact["fact"] for fact in generate_csv()])
 
 
 def find_related_chunks(query, collection, top_k=2):
@@ -180,31 +255,33 @@ def streamlit_app():
 
     # Initialize session state
     if "initialized" not in st.session_state:
-        st.session_state.initialized = False
         st.session_state.facts = generate_csv()
-
-        # Initialize models
         st.session_state.llm_model = LLMModel(llm_type)
-        st.session_state.embedding_model = EmbeddingModel(embedding_type)
-
-        # Setup ChromaDB
-        documents = [fact["fact"] for fact in st.session_state.facts]
-        st.session_state.collection = setup_chromadb(
-            documents, st.session_state.embedding_model
-        )
         st.session_state.initialized = True
 
-    # If models changed, reinitialize
-    if (
-        st.session_state.llm_model.model_type != llm_type
-        or st.session_state.embedding_model.model_type != embedding_type
-    ):
+    # If the LLM changed, reinitialize it
+    if st.session_state.llm_model.model_type != llm_type:
         st.session_state.llm_model = LLMModel(llm_type)
-        st.session_state.embedding_model = EmbeddingModel(embedding_type)
-        documents = [fact["fact"] for fact in st.session_state.facts]
-        st.session_state.collection = setup_chromadb(
-            documents, st.session_state.embedding_model
-        )
+
+    # Collections are shared across sessions; the selected one is built first.
+    # A failed build is retried only when the user selects that model, not on
+    # every rerun
+    fact_collections = get_fact_collections()
+    selected = st.session_state.get("embedding_type") != embedding_type
+    st.session_state.embedding_type = embedding_type
+    fact_collections.prebuild([embedding_type], retry=selected)
+    fact_collections.prebuild(EMBEDDING_TYPES)
+    try:
+        with st.spinner(f"Embedding facts with {embedding_type}..."):
+            st.session_state.collection = fact_collections.get(embedding_type)
+    except Exception as e:
+        st.error(f"Error setting up {embedding_type} embeddings: {str(e)}")
+        return
+
+    st.sidebar.caption(
+        "Collections: "
+        + ", ".join(f"{model} ({state})" for model, state in fact_collections.status().items())
+    )
 
     # Display available facts
     with st.expander("📚 Available Space Facts", expanded=False):
@@ -218,31 +295,46 @@ def streamlit_app():
     )
 
     if query:
-        with st.spinner("Processing your query..."):
-            response, references, augmented_prompt = rag_pipeline(
-                query, st.session_state.collection, st.session_state.llm_model
-            )
-
-            # Display results in columns
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown("### 🤖 Response")
-                st.write(response)
-
-            with col2:
-                st.markdown("### 📖 References Used")
-                for ref in references:
-                    st.write(f"- {ref}")
-
-            # Show technical details in expander
-            with st.expander("🔍 Technical Details", expanded=False):
-                st.markdown("#### Augmented Prompt")
-                st.code(augmented_prompt)
-
-                st.markdown("#### Model Configuration")
-                st.write(f"- LLM Model: {llm_type.upper()}")
-                st.write(f"- Embedding Model: {embedding_type.upper()}")
+        # Serve widget-triggered reruns of the same question from the cache
+        top_k = 2
+        query_cache = session_query_cache(st.session_state)
+        cache_key = (
+            query,
+            collection_version(st.session_state.collection),
+            llm_type,
+            top_k,
+        )
+        result = query_cache.get(cache_key)
+        if result is None:
+            with st.spinner("Processing your query..."):
+                result = rag_pipeline(
+                    query, st.session_state.collection, st.session_state.llm_model, top_k
+                )
+            # Errors are not cached so the next rerun tries again
+            if not result[0].startswith("Error generating response"):
+                query_cache.put(cache_key, result)
+        response, references, augmented_prompt = result
+
+        # Display results in columns
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("### 🤖 Response")
+            st.write(response)
+
+        with col2:
+            st.markdown("### 📖 References Used")
+            for ref in references:
+                st.write(f"- {ref}")
+
+        # Show technical details in expander
+        with st.expander("🔍 Technical Details", expanded=False):
+            st.markdown("#### Augmented Prompt")
+            st.code(augmented_prompt)
+
+            st.markdown("#### Model Configuration")
+            st.write(f"- LLM Model: {llm_type.upper()}")
+            st.write(f"- Embedding Model: {embedding_type.upper()}")
 
 if __name__ == "__main__":
     streamlit_app()
\ No newline at end of file
@@ -4,8 +4,14 @@ from chromadb.utils import embedding_functions
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
-import PyPDF2
-import uuid
+import hashlib
+import json
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from pdf_extract import DEFAULT_BACKEND, extract_text
+from query_cache import collection_version, session_query_cache
 
 # Load environment variables
 load_dotenv()
@@ -13,6 +19,18 @@ load_dotenv()
 # Constants
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+# pypdfium2 when installed (several times faster); set "pypdf2" to match
+# the original output exactly
+PDF_BACKEND = DEFAULT_BACKEND
+CHROMA_PATH = "./chroma_db"
+# Chroma distance above which a chunk is treated as unrelated, per embedding
+# model (None disables the check). simple_rag's values were fitted to short
+# space facts and do not carry over to PDF chunks; calibrate these on your
+# own uploads with:
+#   python calibrate_thresholds.py --collection "documents_{model}" --queries ...
+DISTANCE_THRESHOLDS = {"nomic": None, "chroma": None, "openai": None}
+NO_ANSWER = "I don't know. None of the uploaded documents are relevant to this question."
+REGISTRY_PATH = os.path.join(CHROMA_PATH, "ingested_files.json")
 
 
 class SimpleModelSelector:
@@ -61,52 +79,153 @@ class SimpleModelSelector:
 class SimplePDFProcessor:
     """Handle PDF processing and chunking"""
 
-    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    def __init__(
+        self,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        backend=PDF_BACKEND,
+        workers=None,
+    ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.backend = backend
+        self.workers = workers
+        self.page_offsets = []
+
+    def read_pdf(self, pdf_file, progress=None):
+        """Read PDF and extract text, spreading pages over a process pool.
+
+        The start offset of every page in the returned text is kept in
+        `self.page_offsets`.
+        """
+        extracted = extract_text(
+            pdf_file, backend=self.backend, workers=self.workers, progress=progress
+        )
+        self.page_offsets = extracted.page_offsets
+        return extracted.text
 
-    def read_pdf(self, pdf_file):
-        """Read PDF and extract text"""
-        reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+    def iter_spans(self, text):
+        """Yield (start, end) offsets of each chunk without copying any text.
 
-    def create_chunks(self, text, pdf_file):
-        """Split text into chunks"""
-        chunks = []
+        Chunks are at most `chunk_size` characters and, where possible, end
+        just after a period. Each chunk starts exactly `chunk_overlap`
+        characters before the end of the previous one.
+        """
         start = 0
-
         while start < len(text):
-            # Find end of chunk
-            end = start + self.chunk_size
+            end = min(start + self.chunk_size, len(text))
+
+            # Try to break at sentence end, as long as the chunk still
+            # reaches past the overlap so the next start moves forward
+            if end < len(text):
+                last_period = text.rfind(".", start, end)
+                if last_period - start >= self.chunk_overlap:
+                    end = last_period + 1
+
+            yield start, end
+
+            if end == len(text):
+                break
+            start = max(end - self.chunk_overlap, start + 1)
+
+    def iter_chunk_batches(self, text, pdf_file, batch_size=64, source_hash=None):
+        """Yield lists of at most `batch_size` chunks, copying each chunk's
+        text only when its batch is produced"""
+        source_hash = source_hash or file_hash(pdf_file)
+        batch = []
+        for start, end in self.iter_spans(text):
+            batch.append((start, end))
+            if len(batch) == batch_size:
+                yield self._make_chunks(text, batch, pdf_file, source_hash)
+                batch = []
+        if batch:
+            yield self._make_chunks(text, batch, pdf_file, source_hash)
+
+    def _make_chunks(self, text, spans, pdf_file, source_hash):
+        # Ids come from the file content and offset, so re-ingesting the same
+        # file overwrites its chunks instead of duplicating them
+        return [
+            {
+                "id": f"{source_hash}:{start}",
+                "text": text[start:end],
+                "metadata": self._chunk_metadata(pdf_file, source_hash, start, end),
+            }
+            for start, end in spans
+        ]
+
+    def _chunk_metadata(self, pdf_file, source_hash, start, end):
+        """Source name and hash, plus the 1-based pages the chunk spans"""
+        metadata = {"source": pdf_file.name, "source_hash": source_hash}
+        if self.page_offsets:
+            metadata["page_start"] = bisect_right(self.page_offsets, start)
+            metadata["page_end"] = bisect_right(self.page_offsets, max(end - 1, start))
+        return metadata
+
+    def create_chunks(self, text, pdf_file, source_hash=None):
+        """Split text into chunks"""
+        return self._make_chunks(
+            text, self.iter_spans(text), pdf_file, source_hash or file_hash(pdf_file)
+        )
 
-            # If not at the start, include overlap
-            if start > 0:
-                start = start - self.chunk_overlap
 
-            # Get chunk
-            chunk = text[start:end]
+def file_hash(pdf_file):
+    """SHA-256 of an uploaded file's content"""
+    return hashlib.sha256(pdf_file.getvalue()).hexdigest()
 
-            # Try to break at sentence end
-            if end < len(text):
-                last_period = chunk.rfind(".")
-                if last_period != -1:
-                    chunk = chunk[: last_period + 1]
-                    end = start + last_period + 1
-
-            chunks.append(
-                {
-                    "id": str(uuid.uuid4()),  # cdefield24482kuy
-                    "text": chunk,
-                    "metadata": {"source": pdf_file.name},
-                }
-            )
 
-            start = end
+class PDFUpload:
+    """Snapshot of an uploaded file that can outlive the Streamlit rerun"""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
 
-        return chunks
+class IngestRegistry:
+    """Persistent record of which files each collection already contains.
+
+    Stored as JSON next to the Chroma database and keyed by collection name
+    and file content hash, so a file uploaded again (under any name, in any
+    session, after a restart) is recognised without re-embedding it. The
+    file is re-read on every lookup so concurrent sessions see each other's
+    uploads, and replaced atomically on write.
+    """
+
+    _lock = threading.Lock()  # shared: all sessions in this process write one file
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def files(self, collection_name):
+        """Map of file hash -> entry for everything ingested into a collection"""
+        return self._load().get(collection_name, {})
+
+    def get(self, collection_name, source_hash):
+        return self.files(collection_name).get(source_hash)
+
+    def record(self, collection_name, source_hash, name, chunk_count, pages=None):
+        with self._lock:
+            registry = self._load()
+            registry.setdefault(collection_name, {})[source_hash] = {
+                "name": name,
+                "chunks": chunk_count,
+                "pages": pages,
+                "ingested_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w") as file:
+                json.dump(registry, file, indent=2)
+            os.replace(self.path + ".tmp", self.path)
 
 
 class SimpleRAGSystem:
@@ -117,7 +236,8 @@ class SimpleRAGSystem:
         self.llm_model = llm_model
 
         # Initialize ChromaDB
-        self.db = chromadb.PersistentClient(path="./chroma_db")
+        self.db = chromadb.PersistentClient(path=CHROMA_PATH)
+        self.registry = IngestRegistry()
 
         # Setup embedding function based on model
         self.setup_embedding_function()
@@ -194,30 +314,69 @@ class SimpleRAGSystem:
             if not self.collection:
                 self.collection = self.setup_collection()
 
-            # Add documents
-            self.collection.add(
-                ids=[chunk["id"] for chunk in chunks],
-                documents=[chunk["text"] for chunk in chunks],
-                metadatas=[chunk["metadata"] for chunk in chunks],
-            )
+            self.upsert_chunks(chunks)
             return True
         except Exception as e:
             st.error(f"Error adding documents: {str(e)}")
             return False
 
-    def query_documents(self, query, n_results=3):
-        """Query documents and return relevant chunks"""
+    def upsert_chunks(self, chunks):
+        """Add chunks, raising on failure (safe to call off the script thread)"""
+        # Upsert keeps re-ingestion of a file idempotent
+        self.collection.upsert(
+            ids=[chunk["id"] for chunk in chunks],
+            documents=[chunk["text"] for chunk in chunks],
+            metadatas=[chunk["metadata"] for chunk in chunks],
+        )
+
+    @staticmethod
+    def build_where(sources=None, pages=None):
+        """Chroma `where` clause restricting a search to the given source
+        hashes and to chunks overlapping the inclusive (first, last) pages"""
+        clauses = []
+        if sources:
+            clauses.append({"source_hash": {"$in": list(sources)}})
+        if pages:
+            first, last = pages
+            clauses.append({"page_end": {"$gte": first}})
+            clauses.append({"page_start": {"$lte": last}})
+
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def query_documents(self, query, n_results=3, sources=None, pages=None):
+        """Query documents and return relevant chunks, optionally only from
+        some sources and pages (filtered inside Chroma, before ranking)"""
         try:
             # Ensure collection exists
             if not self.collection:
                 raise ValueError("No collection available")
 
-            results = self.collection.query(query_texts=[query], n_results=n_results)
+            results = self.collection.query(
+                query_texts=[query],
+                n_results=n_results,
+                where=self.build_where(sources, pages),
+            )
             return results
         except Exception as e:
             st.error(f"Error querying documents: {str(e)}")
             return None
 
+    def filter_relevant(self, results):
+        """Keep only the first query's chunks within this embedding model's
+        distance threshold, as flat lists of documents, metadatas, distances"""
+        max_distance = DISTANCE_THRESHOLDS.get(self.embedding_model)
+        relevant = {"documents": [], "metadatas": [], "distances": []}
+        for doc, metadata, distance in zip(
+            results["documents"][0], results["metadatas"][0], results["distances"][0]
+        ):
+            if max_distance is None or distance <= max_distance:
+                relevant["documents"].append(doc)
+                relevant["metadatas"].append(metadata)
+                relevant["distances"].append(distance)
+        return relevant
+
     def generate_response(self, query, context):
         """Generate response using LLM"""
         try:
@@ -256,6 +415,147 @@ class SimpleRAGSystem:
         }
 
 
+class IngestJob:
+    """Progress of one background upload"""
+
+    def __init__(self, job_id, name, source_hash, collection_name):
+        self.job_id = job_id
+        self.name = name
+        self.source_hash = source_hash
+        self.collection_name = collection_name
+        self.status = "queued"  # queued -> parsing -> embedding -> done | failed
+        self.total_pages = 0
+        self.pages_parsed = 0
+        self.total_chunks = 0
+        self.chunks_embedded = 0
+        self.error = None
+        self.started_at = None
+        self.embedding_started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status not in ("done", "failed")
+
+    def chunks_per_second(self):
+        if not self.embedding_started_at or not self.chunks_embedded:
+            return 0.0
+        end = self.finished_at or time.perf_counter()
+        return self.chunks_embedded / max(end - self.embedding_started_at, 1e-9)
+
+
+class IngestionQueue:
+    """Parses, chunks and embeds uploads on worker threads.
+
+    `submit` returns a job id immediately; the UI polls `job(job_id)` for
+    progress. Parsing fans out to a process pool (see `read_pdf`) and
+    embedding is network-bound, so threads are enough to keep several
+    uploads moving while queries run. Submitting a file whose content is
+    already being ingested into the same collection returns the existing job.
+    """
+
+    def __init__(self, workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, upload, rag_system):
+        source_hash = file_hash(upload)
+        collection_name = rag_system.collection.name
+        with self.lock:
+            for job in self.jobs.values():
+                if (
+                    job.active
+                    and job.source_hash == source_hash
+                    and job.collection_name == collection_name
+                ):
+                    return job.job_id
+
+            job_id = f"{source_hash[:12]}-{len(self.jobs) + 1}"
+            job = IngestJob(job_id, upload.name, source_hash, collection_name)
+            self.jobs[job_id] = job
+        self.executor.submit(self._run, job, upload, rag_system)
+        return job_id
+
+    def job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _run(self, job, upload, rag_system):
+        job.started_at = time.perf_counter()
+        try:
+            job.status = "parsing"
+
+            def on_pages(done, total):
+                job.pages_parsed, job.total_pages = done, total
+
+            processor = SimplePDFProcessor()
+            text = processor.read_pdf(upload, progress=on_pages)
+            job.total_chunks = sum(1 for _ in processor.iter_spans(text))
+
+            job.status = "embedding"
+            job.embedding_started_at = time.perf_counter()
+            for chunks in processor.iter_chunk_batches(
+                text, upload, source_hash=job.source_hash
+            ):
+                rag_system.upsert_chunks(chunks)
+                job.chunks_embedded += len(chunks)
+
+            rag_system.registry.record(
+                job.collection_name,
+                job.source_hash,
+                job.name,
+                job.chunks_embedded,
+                pages=job.total_pages,
+            )
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.perf_counter()
+
+
+@st.cache_resource
+def get_ingestion_queue():
+    """One queue per Streamlit process, shared by every session"""
+    return IngestionQueue()
+
+
+@st.fragment(run_every=1.0)
+def show_ingestion_progress(queue):
+    """Redraw upload progress every second without rerunning the whole page"""
+    for job_id in st.session_state.ingest_jobs:
+        job = queue.job(job_id)
+        if job.status == "parsing":
+            fraction = job.pages_parsed / job.total_pages if job.total_pages else 0.0
+            st.progress(
+                fraction,
+                text=f"📄 {job.name}: parsed {job.pages_parsed}/{job.total_pages} pages",
+            )
+        elif job.status == "embedding":
+            st.progress(
+                job.chunks_embedded / max(job.total_chunks, 1),
+                text=(
+                    f"🧮 {job.name}: embedded {job.chunks_embedded}/{job.total_chunks} "
+                    f"chunks ({job.chunks_per_second():.1f} chunks/s)"
+                ),
+            )
+        elif job.status == "queued":
+            st.progress(0.0, text=f"⏳ {job.name}: queued")
+
+    finished = [
+        queue.job(job_id)
+        for job_id in st.session_state.ingest_jobs
+        if not queue.job(job_id).active
+    ]
+    if finished:
+        for job in finished:
+            st.session_state.ingest_jobs.remove(job.job_id)
+            st.session_state.finished_jobs.append(job.job_id)
+        # Full rerun so the query section picks up the new documents
+        st.rerun(scope="app")
+
+
 def main():
     st.title("🤖 Simple RAG System")
 
@@ -266,6 +566,9 @@ def main():
         st.session_state.current_embedding_model = None
     if "rag_system" not in st.session_state:
         st.session_state.rag_system = None
+    if "ingest_jobs" not in st.session_state:
+        st.session_state.ingest_jobs = []  # job ids still running
+        st.session_state.finished_jobs = []  # job ids to report once
 
     # Initialize model selector
     model_selector = SimpleModelSelector()
@@ -276,7 +579,10 @@ def main():
         st.session_state.processed_files.clear()  # Clear processed files
         st.session_state.current_embedding_model = embedding_model
         st.session_state.rag_system = None  # Reset RAG system
-        st.warning("Embedding model changed. Please re-upload your documents.")
+        st.warning(
+            "Embedding model changed. Documents not yet indexed with this model "
+            "need to be re-uploaded."
+        )
 
     # Initialize RAG system
     try:
@@ -297,48 +603,115 @@ def main():
     # File upload
     pdf_file = st.file_uploader("Upload PDF", type="pdf")
 
-    if pdf_file and pdf_file.name not in st.session_state.processed_files:
-        # Process PDF
-        processor = SimplePDFProcessor()
-        with st.spinner("Processing PDF..."):
-            try:
-                # Extract text
-                text = processor.read_pdf(pdf_file)
-                # Create chunks
-                chunks = processor.create_chunks(text, pdf_file)
-                # Add to database
-                if st.session_state.rag_system.add_documents(chunks):
-                    st.session_state.processed_files.add(pdf_file.name)
-                    st.success(f"Successfully processed {pdf_file.name}")
-            except Exception as e:
-                st.error(f"Error processing PDF: {str(e)}")
-
-    # Query interface
-    if st.session_state.processed_files:
+    rag_system = st.session_state.rag_system
+    collection_name = rag_system.collection.name
+    ingestion_queue = get_ingestion_queue()
+    source_hash = file_hash(pdf_file) if pdf_file else None
+
+    if pdf_file and source_hash not in st.session_state.processed_files:
+        if rag_system.registry.get(collection_name, source_hash):
+            # Same content was ingested before: no parsing, no embedding calls
+            st.session_state.processed_files.add(source_hash)
+            st.info(f"{pdf_file.name} is already indexed")
+        else:
+            # Process PDF in the background; progress is polled below
+            upload = PDFUpload(pdf_file.name, pdf_file.getvalue())
+            job_id = ingestion_queue.submit(upload, rag_system)
+            st.session_state.ingest_jobs.append(job_id)
+            st.session_state.processed_files.add(source_hash)
+
+    # Report finished uploads once
+    for job_id in st.session_state.finished_jobs:
+        job = ingestion_queue.job(job_id)
+        if job.status == "done":
+            st.success(f"Successfully processed {job.name}")
+        else:
+            st.error(f"Error processing {job.name}: {job.error}")
+            # Allow the same file to be uploaded again
+            st.session_state.processed_files.discard(job.source_hash)
+    st.session_state.finished_jobs.clear()
+
+    if st.session_state.ingest_jobs:
+        show_ingestion_progress(ingestion_queue)
+
+    # Query interface, available for documents already indexed
+    indexed_files = rag_system.registry.files(collection_name)
+    if indexed_files:
         st.markdown("---")
         st.subheader("🔍 Query Your Documents")
+
+        # Restrict the search to some documents (and pages) if wanted
+        sources = st.multiselect(
+            "Search in documents (all if empty):",
+            options=list(indexed_files),
+            format_func=lambda source_hash: indexed_files[source_hash]["name"],
+        )
+        pages = None
+        page_count = len(sources) == 1 and indexed_files[sources[0]].get("pages")
+        if page_count and page_count > 1:
+            first, last = st.slider("Pages:", 1, page_count, (1, page_count))
+            if (first, last) != (1, page_count):
+                pages = (first, last)
+
         query = st.text_input("Ask a question:")
 
         if query:
-            with st.spinner("Generating response..."):
-                # Get relevant chunks
-                results = st.session_state.rag_system.query_documents(query)
-                if results and results["documents"]:
-                    # Generate response
-                    response = st.session_state.rag_system.generate_response(
-                        query, results["documents"][0]
-                    )
-
-                    if response:
-                        # Display results
-                        st.markdown("### 📝 Answer:")
-                        st.write(response)
+            n_results = 3
+            # Widget-triggered reruns of the same question are served from cache
+            query_cache = session_query_cache(st.session_state)
+            cache_key = (
+                query,
+                collection_version(rag_system.collection),
+                llm_model,
+                n_results,
+                tuple(sorted(sources)),
+                pages,
+            )
+            cached = query_cache.get(cache_key)
 
-                        with st.expander("View Source Passages"):
-                            for idx, doc in enumerate(results["documents"][0], 1):
-                                st.markdown(f"**Passage {idx}:**")
-                                st.info(doc)
-    else:
+            if cached is None:
+                with st.spinner("Generating response..."):
+                    # Get relevant chunks
+                    results = rag_system.query_documents(
+                        query, n_results, sources=sources, pages=pages
+                    )
+                    response = None
+                    if results:
+                        results = rag_system.filter_relevant(results)
+                        if results["documents"]:
+                            # Generate response
+                            response = rag_system.generate_response(
+                                query, results["documents"]
+                            )
+                        else:
+                            # Nothing relevant retrieved: skip the LLM call
+                            response = NO_ANSWER
+                if response:
+                    query_cache.put(cache_key, (results, response))
+            else:
+                results, response = cached
+
+            if response:
+                # Display results
+                st.markdown("### 📝 Answer:")
+                st.write(response)
+
+                with st.expander("View Source Passages"):
+                    passages = zip(
+                        results["documents"], results["metadatas"], results["distances"]
+                    )
+                    for idx, (doc, metadata, distance) in enumerate(passages, 1):
+                        metadata = metadata or {}
+                        location = metadata.get("source", "")
+                        if "page_start" in metadata:
+                            location += f", p. {metadata['page_start']}"
+                            if metadata["page_end"] != metadata["page_start"]:
+                                location += f"-{metadata['page_end']}"
+                        st.markdown(
+                            f"**Passage {idx}** ({location}, distance {distance:.3f}):"
+                        )
+                        st.info(doc)
+    elif not st.session_state.ingest_jobs:
         st.info("👆 Please upload a PDF document to get started!")
 
 
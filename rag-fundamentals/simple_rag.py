@@ -1,23 +1,45 @@
+import asyncio
 import csv
+import random
+import time
 import pandas as pd
 import chromadb
 from chromadb.utils import embedding_functions
-from openai import OpenAI
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
 import os
 from dotenv import load_dotenv
+from vector_index import NumpyVectorIndex
 
 # === Load API Key ===
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
+CHROMA_PATH = "./chroma_db"
+# Untracked store for this script's demo collection, kept out of the
+# checked-in ./chroma_db so runs leave the working tree clean
+DEMO_CHROMA_PATH = "./simple_rag_db"
+
+# === Relevance Thresholds ===
+# Chroma distance (squared L2) above which a chunk is treated as unrelated
+# to the query, per embedding model. None disables the check. Re-derive
+# these for your own data with calibrate_thresholds.py.
+DISTANCE_THRESHOLDS = {
+    "openai": 1.45,
+    "chroma": 1.6,
+    "nomic": None,
+}
+NO_ANSWER = "I don't know. None of the available documents are relevant to this question."
 
 # === Embedding Model Setup ===
 class EmbeddingModel:
     def __init__(self, model_type="openai"):
         self.model_type = model_type
         if model_type == "openai":
-            self.client = OpenAI(api_key)
-            self.embedding_fn = embedding_functions.OpenAIEmbedding(
-                api_key,
+            self.client = OpenAI(api_key=api_key)
+            self.embedding_fn = embedding_functions.OpenAIEmbeddingFunction(
+                api_key=api_key,
                 model_name="text-embedding-3-small",
             )
         elif model_type == "chroma":
@@ -26,7 +48,7 @@ class EmbeddingModel:
             # using Ollama nomic-embed-text model
             self.embedding_fn = embedding_functions.OpenAIEmbeddingFunction(
                 api_key="ollama",
-                api_base="http://localhost:11434/v1",
+                api_base=OLLAMA_BASE_URL,
                 model_name="nomic-embed-text",
             )
 
@@ -38,7 +60,7 @@ class LLMModel:
             self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
             self.model_name = "gpt-4o-mini"
         else:
-            self.client = OpenAI(base_url="http://localhost:11434/v1", api_key="ollama")
+            self.client = OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
             self.model_name = "llama3.2"
 
     def generate_completion(self, messages):
@@ -53,6 +75,116 @@ class LLMModel:
             return f"Error generating response: {str(e)}"
 
 
+class AsyncLLMModel:
+    """Non-blocking counterpart of `LLMModel` for high-concurrency workers.
+
+    One `AsyncOpenAI` client (and its HTTP connection pool) is shared by
+    every request made through the instance. Rate limits (429), server
+    errors (5xx), timeouts and dropped connections are retried with
+    exponential backoff and full jitter; any other error is raised to the
+    caller instead of being turned into a response string.
+    """
+
+    def __init__(
+        self,
+        model_type="openai",
+        timeout=30.0,
+        max_retries=4,
+        base_delay=0.5,
+        max_delay=8.0,
+        max_connections=100,
+    ):
+        self.model_type = model_type
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        # Retries are handled here so they can be applied to streams too
+        http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )
+        )
+        if model_type == "openai":
+            self.client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,
+                http_client=http_client,
+            )
+            self.model_name = "gpt-4o-mini"
+        else:
+            self.client = AsyncOpenAI(
+                base_url=OLLAMA_BASE_URL,
+                api_key="ollama",
+                max_retries=0,
+                http_client=http_client,
+            )
+            self.model_name = "llama3.2"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.client.close()
+
+    @staticmethod
+    def _is_retryable(error):
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+            # APITimeoutError is a subclass of APIConnectionError
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def _backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(0, delay)
+
+    async def generate_completion(self, messages):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=0.0,
+                    timeout=self.timeout,
+                )
+                return response.choices[0].message.content
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def stream_completion(self, messages):
+        """Yield the response text token by token as it is generated.
+
+        A failed attempt is only retried if nothing has been yielded yet,
+        so callers never see duplicated text.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=0.0,
+                    timeout=self.timeout,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        started = True
+                        yield chunk.choices[0].delta.content
+                return
+            except Exception as e:
+                if started or attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+
 # === Data Utilities ===
 def select_models():
     # Select LLM Model
@@ -125,48 +257,114 @@ def generate_csv():
 
     print("CSV file 'space_facts.csv' created successfully!")
 
-def load_csv():
-    df = pd.read_csv("space_facts.csv")
-    documents = df["fact"].tolist()
-    print("\nLoaded documents:")
-    for doc in documents:
-        print(f"- {doc}")
-    return documents
+def iter_csv_chunks(path="space_facts.csv", chunksize=1000):
+    """Yield the `fact` column in lists of at most `chunksize` rows."""
+    for df in pd.read_csv(path, usecols=["fact"], chunksize=chunksize):
+        yield df["fact"].tolist()
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
 # === ChromaDB Setup ===
-def setup_chromadb(documents, embedding_model):
-    client = chromadb.Client()
+def create_collection(embedding_model, path=DEMO_CHROMA_PATH):
+    # On disk, so streamed ingestion does not keep every row in memory.
+    # One collection per embedding model, reused across runs; ingest_csv
+    # only embeds rows that changed since the last run.
+    client = chromadb.PersistentClient(path=path)
+    return client.get_or_create_collection(
+        name=f"space_facts_{embedding_model.model_type}",
+        embedding_function=embedding_model.embedding_fn,
+        metadata={"model": embedding_model.model_type},
+    )
 
-    try:
-        client.delete_collection("space_facts")
-    except:
-        pass
+def setup_numpy_index(documents, embedding_model, path=None, storage="float32"):
+    """In-process exact-search alternative to a Chroma collection.
 
-    collection = client.create_collection(
-        name="space_facts", embedding_function=embedding_model.embedding_fn
+    `storage` can be "float16" or "int8" to keep a quantized copy of the
+    embeddings in RAM; the top candidates are rescored against float32
+    vectors kept under `path`, which quantized storage requires.
+    """
+    index = NumpyVectorIndex(
+        embedding_function=embedding_model.embedding_fn, path=path, storage=storage
     )
+    # Always start from an empty index
+    index.clear()
+    index.add(documents=documents, ids=[str(i) for i in range(len(documents))])
+    if path:
+        index.save()
+
+    print("\nDocuments added to NumPy vector index successfully!")
+    return index
+
+def ingest_csv(collection, path="space_facts.csv", chunksize=1000):
+    """Stream a CSV into the collection, embedding one chunk at a time.
+
+    Only one chunk of rows is read and embedded at a time, and rows are
+    written to the on-disk collection from `create_collection`, so the file
+    itself is never held in memory. Chroma's HNSW index over the embeddings
+    still grows with the number of rows. Ids are the 0-based row numbers;
+    rows already stored with the same text are not embedded again, and rows
+    past the end of the CSV are deleted.
+    """
+    print(f"\nIngesting {path} in chunks of {chunksize} rows...")
+    start = time.perf_counter()
+    total = embedded = 0
+
+    for documents in iter_csv_chunks(path, chunksize):
+        ids = [str(i) for i in range(total, total + len(documents))]
+        stored = collection.get(ids=ids, include=["documents"])
+        stored = dict(zip(stored["ids"], stored["documents"]))
+        stale = [(i, doc) for i, doc in zip(ids, documents) if stored.get(i) != doc]
+        if stale:
+            collection.upsert(
+                ids=[i for i, _ in stale], documents=[doc for _, doc in stale]
+            )
+        total += len(documents)
+        embedded += len(stale)
+
+        elapsed = time.perf_counter() - start
+        rss = peak_rss_mb()
+        print(
+            f"- {total} rows ({embedded} embedded) in {elapsed:.1f}s "
+            f"({total / elapsed:.1f} rows/s"
+            + (f", peak RSS {rss:.0f} MB)" if rss is not None else ")")
+        )
 
-    collection.add(documents=documents, ids=[str(i) for i in range(len(documents))])
+    extra = collection.count() - total
+    if extra > 0:
+        collection.delete(ids=[str(i) for i in range(total, total + extra)])
 
-    print("\nDocuments added to ChromaDB collection successfully!")
-    return collection
+    print(f"\nIngested {total} documents into ChromaDB successfully!")
+    return total
 
 # === Query and Prompt Augmentation ===
-def find_related_chunks(query, collection, top_k=2):
-    results = collection.query(query_texts=[query], n_results=top_k)
+def find_related_chunks(query, collection, top_k=2, query_embedding=None):
+    if query_embedding is None:
+        results = collection.query(query_texts=[query], n_results=top_k)
+    else:
+        results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
+
+    documents = results["documents"][0]
+    distances = (results.get("distances") or [[None] * len(documents)])[0]
 
     print("\nRelated chunks found:")
-    for doc in results["documents"][0]:
-        print(f"- {doc}")
+    for doc, distance in zip(documents, distances):
+        print(f"- {doc}" + (f" (distance {distance:.3f})" if distance is not None else ""))
 
     return list(
         zip(
-            results["documents"][0],
+            documents,
             (
                 results["metadatas"][0]
                 if results["metadatas"][0]
-                else [{}] * len(results["documents"][0])
+                else [{}] * len(documents)
             ),
+            distances,
         )
     )
 
@@ -179,22 +377,35 @@ def augment_prompt(query, related_chunks):
 
     return augmented_prompt
 
+def build_messages(augmented_prompt):
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant who can answer questions about space but only answers questions that are directly related to the sources/documents given.",
+        },
+        {"role": "user", "content": augmented_prompt},
+    ]
+
 # === RAG Pipeline ===
-def rag_pipeline(query, collection, llm_model, top_k=2):
+def rag_pipeline(query, collection, llm_model, top_k=2, max_distance=None):
     print(f"\nProcessing query: {query}")
 
     related_chunks = find_related_chunks(query, collection, top_k)
-    augmented_prompt = augment_prompt(query, related_chunks)
 
-    response = llm_model.generate_completion(
-        [
-            {
-                "role": "system",
-                "content": "You are a helpful assistant who can answer questions about space but only answers questions that are directly related to the sources/documents given.",
-            },
-            {"role": "user", "content": augmented_prompt},
+    # Only keep chunks close enough to the query; with none left, answering
+    # needs no LLM call at all
+    if max_distance is not None:
+        related_chunks = [
+            chunk for chunk in related_chunks
+            if chunk[2] is not None and chunk[2] <= max_distance
         ]
-    )
+        if not related_chunks:
+            print(f"\nNo chunk within distance {max_distance}; skipping generation.")
+            return NO_ANSWER, []
+
+    augmented_prompt = augment_prompt(query, related_chunks)
+
+    response = llm_model.generate_completion(build_messages(augmented_prompt))
 
     print("\nGenerated response:")
     print(response)
@@ -216,12 +427,10 @@ def main():
     print(f"\nUsing LLM: {llm_type.upper()}")
     print(f"Using Embeddings: {embedding_type.upper()}")
 
-    # Generate and load data
+    # Generate data and stream it into ChromaDB
     generate_csv()
-    documents = load_csv()
-
-    # Setup ChromaDB
-    collection = setup_chromadb(documents, embedding_model)
+    collection = create_collection(embedding_model)
+    ingest_csv(collection)
 
     # Run queries
     queries = [
@@ -232,7 +441,12 @@ def main():
     for query in queries:
         print("\n" + "=" * 50)
         print(f"Processing query: {query}")
-        response, references = rag_pipeline(query, collection, llm_model)
+        response, references = rag_pipeline(
+            query,
+            collection,
+            llm_model,
+            max_distance=DISTANCE_THRESHOLDS[embedding_type],
+        )
 
         print("\nFinal Results:")
         print("-" * 30)
@@ -0,0 +1,193 @@
+"""Deterministic offline stand-in for the OpenAI and Ollama HTTP APIs.
+
+Serves `/v1/embeddings` and `/v1/chat/completions` (plain and streamed) so
+the RAG scripts can run without network access or API keys, and so two
+benchmark runs on different commits see exactly the same responses.
+
+Embeddings are hashed bags of words: the same text always maps to the same
+unit vector, and texts that share words point in similar directions, so
+retrieval still returns sensible chunks. Chat completions echo a fixed
+answer after a configurable, constant delay.
+
+Usage:
+    python stub_llm_server.py --port 8008 --latency-ms 50
+    OPENAI_BASE_URL=http://127.0.0.1:8008/v1 OLLAMA_BASE_URL=http://127.0.0.1:8008/v1 python simple_rag.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Dimensions of the real models, so collections have the same shape
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+    "nomic-embed-text": 768,
+}
+DEFAULT_DIMENSIONS = 384
+
+
+def embed_text(text, dimensions):
+    """Hash every lower-cased word into a signed bucket and normalize"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.sha256(word.encode()).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0], norm = 1.0, 1.0
+    return vector / norm
+
+
+def completion_text(messages):
+    question = messages[-1]["content"] if messages else ""
+    digest = hashlib.sha256(question.encode()).hexdigest()[:8]
+    return f"Stub answer {digest}: based on the provided context, here is a short reply."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm plus delayed ACKs add ~40 ms to every keep-alive request
+    disable_nagle_algorithm = True
+    latency = 0.0  # seconds per chat completion, set by make_server
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.endswith("/embeddings"):
+            self._embeddings(request)
+        elif self.path.endswith("/chat/completions"):
+            self._chat_completions(request)
+        else:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, 404)
+
+    def _embeddings(self, request):
+        texts = request["input"]
+        if isinstance(texts, str):
+            texts = [texts]
+        model = request.get("model", "")
+        dimensions = request.get("dimensions") or EMBEDDING_DIMENSIONS.get(
+            model, DEFAULT_DIMENSIONS
+        )
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = embed_text(text, dimensions)
+            if request.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(len(text.split()) for text in texts)
+        self._send_json(
+            {
+                "object": "list",
+                "data": data,
+                "model": model,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+    def _chat_completions(self, request):
+        time.sleep(self.latency)
+        text = completion_text(request.get("messages", []))
+        model = request.get("model", "stub")
+        created = 0  # fixed so responses are byte-for-byte reproducible
+
+        if not request.get("stream"):
+            self._send_json(
+                {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 0,
+                        "completion_tokens": len(text.split()),
+                        "total_tokens": len(text.split()),
+                    },
+                }
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in re.findall(r"\S+\s*", text):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def make_server(host="127.0.0.1", port=0, latency_ms=0.0):
+    """Create (but do not start) a stub server; port 0 picks a free port"""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"latency": latency_ms / 1000})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_background_server(latency_ms=0.0):
+    """Serve on a free local port from a daemon thread.
+
+    Returns the server and its `/v1` base URL; call `server.shutdown()`
+    when done.
+    """
+    server = make_server(latency_ms=latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenAI/Ollama stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms)
+    print(f"Stub server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import json
+import os
+
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CODES_FILE = "codes.npy"
+SCALES_FILE = "scales.npy"
+RECORDS_FILE = "records.json"
+# float32 rows added since the last save, for quantized storage
+STAGED_EMBEDDINGS_FILE = "embeddings.staged.npy"
+
+STORAGE_TYPES = ("float32", "float16", "int8")
+
+
+def normalize(vectors):
+    """Return float32 copies of `vectors` scaled to unit L2 norm"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors, storage):
+    """Return (codes, scales) for unit vectors in the given storage type.
+
+    int8 uses one scale per vector (max |x| / 127), so every vector keeps
+    the full int8 range no matter how its energy is spread.
+    """
+    if storage == "float16":
+        return vectors.astype(np.float16), None
+    if storage == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantized storage type: {storage}")
+
+
+class NumpyVectorIndex:
+    """Exact in-process vector index with the same add/query surface as a
+    ChromaDB collection.
+
+    Embeddings are stored L2-normalized as float32, so the inner product is
+    the cosine similarity and one matrix multiply scores every document.
+    Distances are reported as squared L2 (`2 - 2 * cosine`), the same
+    metric as Chroma's default space, so results are interchangeable.
+
+    With a `path` the index is persisted as a `.npy` file plus a JSON file
+    of ids, documents and metadata. Loading memory-maps the `.npy` file, so
+    opening an index is near-instant and pages are read on first use.
+
+    `storage="float16"` or `"int8"` keeps only a quantized copy of the
+    embeddings in RAM for the full scan. The best `rescore_factor * k`
+    candidates are then rescored exactly against the float32 vectors, which
+    never leave disk: they are memory-mapped from a file under `path` (so
+    quantized storage requires one), `add` appends to that file block by
+    block, and only the candidate rows are ever read. Each `add` rewrites
+    the file, so add in large batches.
+    """
+
+    def __init__(
+        self,
+        embedding_function=None,
+        path=None,
+        query_batch_size=256,
+        storage="float32",
+        rescore_factor=4,
+        scan_block_size=65536,
+    ):
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"storage must be one of {STORAGE_TYPES}, got {storage!r}")
+        if storage != "float32" and not path:
+            raise ValueError(f"{storage} storage keeps float32 vectors on disk and needs a path")
+        self.embedding_function = embedding_function
+        self.path = path
+        self.query_batch_size = query_batch_size
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+        self.scan_block_size = scan_block_size
+
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.embeddings = None
+        self.codes = None
+        self.scales = None
+        self._staged = False
+
+        if path and os.path.exists(os.path.join(path, EMBEDDINGS_FILE)):
+            self.load()
+
+    def count(self):
+        return len(self.ids)
+
+    def memory_bytes(self):
+        """Bytes of vector data held in RAM.
+
+        float32 embeddings count even when memory-mapped, since the full
+        scan pages all of them in; with quantized storage they stay on disk
+        and only the codes and scales count.
+        """
+        arrays = [self.embeddings] if self.storage == "float32" else [self.codes, self.scales]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def clear(self):
+        """Drop every entry; files under `path` are replaced on the next save"""
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.embeddings = self.codes = self.scales = None
+        self._staged = False
+
+    def load(self):
+        """Memory-map the embeddings and read the records from `self.path`"""
+        self.embeddings = np.load(
+            os.path.join(self.path, EMBEDDINGS_FILE), mmap_mode="r"
+        )
+        if self.storage != "float32":
+            codes_path = os.path.join(self.path, CODES_FILE)
+            codes = np.load(codes_path) if os.path.exists(codes_path) else None
+            if codes is not None and codes.dtype == np.dtype(self.storage):
+                self.codes = codes
+                if self.storage == "int8":
+                    self.scales = np.load(os.path.join(self.path, SCALES_FILE))
+            else:
+                # Saved with another storage type: quantize from the float32
+                # file a block at a time
+                parts = [
+                    quantize(self.embeddings[start : start + self.scan_block_size], self.storage)
+                    for start in range(0, len(self.embeddings), self.scan_block_size)
+                ]
+                self.codes = np.concatenate([codes for codes, _ in parts])
+                if self.storage == "int8":
+                    self.scales = np.concatenate([scales for _, scales in parts])
+        self._staged = False
+        with open(os.path.join(self.path, RECORDS_FILE)) as file:
+            records = json.load(file)
+        self.ids = records["ids"]
+        self.documents = records["documents"]
+        self.metadatas = records["metadatas"]
+
+    def save(self):
+        """Write the index to `self.path`, replacing any previous files"""
+        if not self.path:
+            raise ValueError("NumpyVectorIndex has no path to save to")
+        os.makedirs(self.path, exist_ok=True)
+
+        # Write to temporary files first so a crash never leaves half an index
+        arrays = {}
+        if self.embeddings is None:
+            # Empty index: save zero-row arrays so it loads back empty
+            arrays[EMBEDDINGS_FILE] = np.zeros((0, 0), dtype=np.float32)
+            if self.storage != "float32":
+                arrays[CODES_FILE] = np.zeros((0, 0), dtype=self.storage)
+                if self.storage == "int8":
+                    arrays[SCALES_FILE] = np.zeros(0, dtype=np.float32)
+        else:
+            if not self._staged:
+                arrays[EMBEDDINGS_FILE] = np.ascontiguousarray(self.embeddings)
+            if self.storage != "float32":
+                arrays[CODES_FILE] = self.codes
+                if self.scales is not None:
+                    arrays[SCALES_FILE] = self.scales
+        for name, array in arrays.items():
+            with open(os.path.join(self.path, name + ".tmp"), "wb") as file:
+                np.save(file, array)
+
+        records_path = os.path.join(self.path, RECORDS_FILE)
+        with open(records_path + ".tmp", "w") as file:
+            json.dump(
+                {
+                    "ids": self.ids,
+                    "documents": self.documents,
+                    "metadatas": self.metadatas,
+                },
+                file,
+            )
+
+        if self._staged:
+            os.replace(
+                os.path.join(self.path, STAGED_EMBEDDINGS_FILE),
+                os.path.join(self.path, EMBEDDINGS_FILE),
+            )
+        for name in [*arrays, RECORDS_FILE]:
+            path = os.path.join(self.path, name)
+            os.replace(path + ".tmp", path)
+
+        # Re-open memory-mapped so the in-RAM copy can be released
+        self.load()
+
+    def _embed(self, texts):
+        if self.embedding_function is None:
+            raise ValueError("An embedding_function is required to embed texts")
+        return self.embedding_function(list(texts))
+
+    def _append_on_disk(self, vectors):
+        """Return a memory-map of the float32 embeddings plus `vectors`,
+        written to the staging file under `self.path` without ever holding
+        the existing rows in RAM at once"""
+        os.makedirs(self.path, exist_ok=True)
+        count = 0 if self.embeddings is None else len(self.embeddings)
+        staged_path = os.path.join(self.path, STAGED_EMBEDDINGS_FILE)
+        staged = np.lib.format.open_memmap(
+            staged_path + ".tmp",
+            mode="w+",
+            dtype=np.float32,
+            shape=(count + len(vectors), vectors.shape[1]),
+        )
+        for start in range(0, count, self.scan_block_size):
+            end = min(start + self.scan_block_size, count)
+            staged[start:end] = self.embeddings[start:end]
+        staged[count:] = vectors
+        staged.flush()
+        del staged
+        os.replace(staged_path + ".tmp", staged_path)
+        self._staged = True
+        return np.load(staged_path, mmap_mode="r")
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None):
+        """Add documents, embedding them unless `embeddings` are given"""
+        if embeddings is None:
+            if documents is None:
+                raise ValueError("Either documents or embeddings are required")
+            embeddings = self._embed(documents)
+        vectors = normalize(embeddings)
+
+        if len(vectors) != len(ids):
+            raise ValueError("ids and embeddings must have the same length")
+        known = set(self.ids)
+        duplicates = [id_ for id_ in ids if id_ in known]
+        if duplicates:
+            raise ValueError(f"IDs already exist in the index: {duplicates[:5]}")
+
+        if self.storage != "float32":
+            self.embeddings = self._append_on_disk(vectors)
+        elif self.embeddings is None or len(self.embeddings) == 0:
+            self.embeddings = vectors
+        else:
+            self.embeddings = np.concatenate([self.embeddings, vectors])
+
+        if self.storage != "float32":
+            codes, scales = quantize(vectors, self.storage)
+            if self.codes is None or len(self.codes) == 0:
+                self.codes, self.scales = codes, scales
+            else:
+                self.codes = np.concatenate([self.codes, codes])
+                if scales is not None:
+                    self.scales = np.concatenate([self.scales, scales])
+
+        self.ids.extend(ids)
+        self.documents.extend(documents if documents is not None else [None] * len(ids))
+        self.metadatas.extend(metadatas if metadatas is not None else [None] * len(ids))
+
+    def _scan_top_k(self, queries, k):
+        """Return (indices, approximate similarities) of the k best documents
+        per query by quantized score.
+
+        Codes are dequantized a block at a time and only a running top-k is
+        kept, so neither a float32 copy of the codes nor a (queries x
+        documents) score matrix ever exists.
+        """
+        best = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.codes), self.scan_block_size):
+            block = self.codes[start : start + self.scan_block_size].astype(np.float32)
+            block_scores = queries @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start : start + self.scan_block_size]
+            block_best, block_best_scores = self._select(block_scores, min(k, len(block)))
+
+            # Merge with the best so far
+            merged = np.concatenate([best, block_best + start], axis=1)
+            columns, best_scores = self._select(
+                np.concatenate([best_scores, block_best_scores], axis=1), k
+            )
+            best = np.take_along_axis(merged, columns, axis=1)
+        return best, best_scores
+
+    def _top_k(self, queries, k):
+        """Return (indices, similarities) of the k best documents per query"""
+        if self.storage == "float32":
+            return self._select(queries @ self.embeddings.T, k)
+        if not self.rescore_factor:
+            return self._scan_top_k(queries, k)
+
+        candidates, _ = self._scan_top_k(queries, min(k * self.rescore_factor, self.count()))
+        # Exact float32 rescoring, reading only the candidate rows
+        unique = np.unique(candidates)
+        rows = np.asarray(self.embeddings[unique])
+        exact = np.einsum("qd,qcd->qc", queries, rows[np.searchsorted(unique, candidates)])
+        order, scores = self._select(exact, k)
+        return np.take_along_axis(candidates, order, axis=1), scores
+
+    @staticmethod
+    def _select(scores, k):
+        """Return (column indices, scores) of the k highest scores per row"""
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return (
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1),
+        )
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10):
+        """Return the `n_results` nearest documents for every query, shaped
+        like the result of `chromadb.Collection.query`"""
+        if query_embeddings is None:
+            if query_texts is None:
+                raise ValueError("Either query_texts or query_embeddings are required")
+            query_embeddings = self._embed(query_texts)
+        queries = normalize(query_embeddings)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, self.count())
+        if k == 0:
+            for key in results:
+                results[key] = [[] for _ in range(len(queries))]
+            return results
+
+        for batch_start in range(0, len(queries), self.query_batch_size):
+            batch = queries[batch_start : batch_start + self.query_batch_size]
+            indices, similarities = self._top_k(batch, k)
+
+            for row, scores in zip(indices, similarities):
+                results["ids"].append([self.ids[i] for i in row])
+                results["documents"].append([self.documents[i] for i in row])
+                results["metadatas"].append([self.metadatas[i] for i in row])
+                results["distances"].append((2.0 - 2.0 * scores).tolist())
+
+        return results